@@ -153,6 +153,38 @@ class TaskBasedContestForm(forms.Form):
         )
     )
 
+    scoreboard_freeze_time = forms.DateTimeField(
+        label=_('Scoreboard freeze'),
+        help_text=_('Since this time and until the finish participants see the scoreboard at this moment. Clear to unfreeze'),
+        required=False,
+        widget=DateTimePicker(
+            options={'format': 'YYYY-MM-DD HH:mm'},
+            attrs={
+                'class': 'form-control-short'
+            }
+        )
+    )
+
+    attempts_limit = forms.IntegerField(
+        label=_('Attempts limit'),
+        help_text=_('How many attempts one participant can send in the period. Empty for default'),
+        required=False,
+        min_value=1,
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control-short'
+        })
+    )
+
+    attempts_limit_period = forms.IntegerField(
+        label=_('Attempts limit period'),
+        help_text=_('In seconds. Empty for one minute'),
+        required=False,
+        min_value=1,
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control-short'
+        })
+    )
+
     tasks_grouping = forms.CharField(
         label=_('Task grouping'),
         help_text=_('Enable categories or list all tasks one by one'),
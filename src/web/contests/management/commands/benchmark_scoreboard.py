@@ -0,0 +1,121 @@
+import datetime
+import random
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+import contests.models
+import contests.views
+import taskbased.categories.models as categories_models
+import taskbased.tasks.models as tasks_models
+import users.models
+
+
+class Command(BaseCommand):
+    help = 'Measures rendering time of the scoreboard page. All created objects are rolled back after the benchmark'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--participants', type=int, default=1000)
+        parser.add_argument('--tasks', type=int, default=60)
+        parser.add_argument('--categories', type=int, default=6)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            contest = self._create_contest(options['participants'], options['tasks'], options['categories'])
+
+            request = RequestFactory().get('/')
+            request.user = AnonymousUser()
+            # Render all participants on one page
+            with override_settings(DRAPO_SCOREBOARD_PAGE_SIZE=options['participants']):
+                # Warm up: calculate the scoreboard and put it into the cache
+                contests.views.scoreboard(request, contest.id)
+
+                timings = []
+                for _ in range(options['repeat']):
+                    reset_queries()
+                    with CaptureQueriesContext(connection) as queries:
+                        start_time = time.perf_counter()
+                        response = contests.views.scoreboard(request, contest.id)
+                        timings.append(time.perf_counter() - start_time)
+
+            self.stdout.write('Participants: %d, tasks: %d, page size: %d KB' % (
+                options['participants'], options['tasks'], len(response.content) // 1024
+            ))
+            self.stdout.write('Rendering time: best %.3f s, average %.3f s' % (
+                min(timings), sum(timings) / len(timings)
+            ))
+            self.stdout.write('Queries: %d' % len(queries))
+
+            transaction.set_rollback(True)
+        # Contest's id can be reused after the rollback, so its cached scoreboard is invalidated.
+        # The shared cache is not cleared: it keeps scoreboards and rate limits of real contests
+        contest.invalidate_scoreboard()
+
+    @staticmethod
+    def _create_contest(participants_count, tasks_count, categories_count):
+        now = timezone.now()
+        contest = contests.models.TaskBasedContest.objects.create(
+            name='Benchmark',
+            is_visible_in_list=True,
+            registration_type=contests.models.ContestRegistrationType.Open,
+            participation_mode=contests.models.ContestParticipationMode.Individual,
+            start_time=now - datetime.timedelta(hours=1),
+            finish_time=now + datetime.timedelta(hours=1),
+            registration_start_time=now - datetime.timedelta(hours=1),
+            registration_finish_time=now + datetime.timedelta(hours=1),
+            short_description='Benchmark',
+            description='Benchmark',
+            tasks_grouping=contests.models.TasksGroping.ByCategories,
+        )
+        contest_categories = categories_models.ContestCategories.objects.create(contest=contest)
+
+        tasks = []
+        for category_index in range(categories_count):
+            category = categories_models.Category.objects.create(
+                name='Category %d' % (category_index + 1), description=''
+            )
+            contest_categories.categories.add(category)
+            for task_index in range(tasks_count // categories_count):
+                task = tasks_models.Task.objects.create(
+                    name='Task %d' % (task_index + 1),
+                    max_score=(task_index + 1) * 100,
+                    statement_generator=tasks_models.TextStatementGenerator.objects.create(
+                        title='Task', template='Statement'
+                    ),
+                    checker=tasks_models.TextChecker.objects.create(answer='flag'),
+                )
+                category.tasks.add(task)
+                tasks.append(task)
+
+        users.models.User.objects.bulk_create([
+            users.models.User(username='benchmark%d' % i, email='benchmark%d@example.com' % i)
+            for i in range(participants_count)
+        ])
+        participants = [
+            contests.models.IndividualParticipant.objects.create(contest=contest, user=user)
+            for user in users.models.User.objects.filter(username__startswith='benchmark')
+        ]
+
+        results = []
+        for participant in participants:
+            for task in tasks:
+                if random.random() < 0.5:
+                    results.append(tasks_models.ParticipantTaskResult(
+                        contest=contest,
+                        participant=participant,
+                        task=task,
+                        tries_count=1,
+                        best_score=task.max_score,
+                        best_score_time=now,
+                        first_success_time=now,
+                        last_success_time=now,
+                    ))
+        tasks_models.ParticipantTaskResult.objects.bulk_create(results)
+
+        return contest
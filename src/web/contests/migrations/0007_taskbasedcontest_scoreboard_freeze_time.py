@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 04:43
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contests', '0006_auto_20160718_1313'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskbasedcontest',
+            name='scoreboard_freeze_time',
+            field=models.DateTimeField(blank=True, help_text='Since this time and until the finish participants see the scoreboard at this moment. Clear to unfreeze', null=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 05:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contests', '0007_taskbasedcontest_scoreboard_freeze_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskbasedcontest',
+            name='attempts_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='How many attempts one participant can send in attempts_limit_period seconds. Empty for DRAPO_MAX_TRIES_IN_MINUTE', null=True),
+        ),
+        migrations.AddField(
+            model_name='taskbasedcontest',
+            name='attempts_limit_period',
+            field=models.PositiveIntegerField(blank=True, help_text='In seconds. Empty for one minute', null=True),
+        ),
+    ]
@@ -1,11 +1,16 @@
+import time
+
 import djchoices
 import polymorphic.models
 from cached_property import cached_property
+from django.conf import settings
 from django.core import urlresolvers
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
 from django.utils import timezone
 
 import drapo.models
+import drapo.ratelimit
 import teams.models
 import users.models
 from drapo.models import ModelWithTimestamps
@@ -136,6 +141,45 @@ class Contest(polymorphic.models.PolymorphicModel):
     def is_individual(self):
         return self.participation_mode == ContestParticipationMode.Individual
 
+    @property
+    def _scoreboard_version_cache_key(self):
+        return 'drapo:contests:%d:scoreboard_version' % self.id
+
+    def get_scoreboard_version(self):
+        """
+        Returns version of the contest's scoreboard. Version changes each time when something
+        visible in the scoreboard changes, so it can be used as a part of cache keys
+        """
+        return _get_cache_version(self._scoreboard_version_cache_key)
+
+    def invalidate_scoreboard(self):
+        _increment_cache_version(self._scoreboard_version_cache_key)
+
+
+def _get_cache_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Start from current time, not from 1: version must not return to the old value
+        # if the key has been evicted from the cache
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _increment_cache_version(key):
+    """
+    Version is incremented after the commit of the current transaction. Otherwise another worker could
+    recalculate cached data before the commit and store the old data under the new version
+    """
+    def increment():
+        try:
+            cache.incr(key)
+        except ValueError:
+            # There is no version in the cache yet
+            _get_cache_version(key)
+
+    transaction.on_commit(increment)
+
 
 class TaskBasedContest(Contest):
     tasks_grouping = models.CharField(
@@ -144,12 +188,32 @@ class TaskBasedContest(Contest):
         validators=[TasksGroping.validator]
     )
 
+    scoreboard_freeze_time = models.DateTimeField(
+        help_text='Since this time and until the finish participants see the scoreboard at this moment. Clear to unfreeze',
+        blank=True,
+        null=True
+    )
+
+    attempts_limit = models.PositiveIntegerField(
+        help_text='How many attempts one participant can send in attempts_limit_period seconds. '
+                  'Empty for DRAPO_MAX_TRIES_IN_MINUTE',
+        blank=True,
+        null=True
+    )
+
+    attempts_limit_period = models.PositiveIntegerField(
+        help_text='In seconds. Empty for one minute',
+        blank=True,
+        null=True
+    )
+
     @cached_property
     def categories(self):
         if self.tasks_grouping != TasksGroping.ByCategories:
             return []
 
-        return list(self.categories_list.categories.all())
+        # Tasks of all categories are loaded by one query
+        return list(self.categories_list.categories.prefetch_related('tasks'))
 
     @cached_property
     def tasks(self):
@@ -158,6 +222,26 @@ class TaskBasedContest(Contest):
 
         return list(self.tasks_list.tasks.all())
 
+    @cached_property
+    def tasks_tree(self):
+        """
+        Ids of contest's tasks in their order: list of tasks ids for each category
+        or one list with all tasks if contest has no categories
+        """
+        if self.tasks_grouping == TasksGroping.OneByOne:
+            return [[task.id for task in self.tasks]]
+        if self.tasks_grouping == TasksGroping.ByCategories:
+            return [[task.id for task in category.tasks.all()] for category in self.categories]
+        return []
+
+    def get_tasks_ids(self):
+        """ Returns ids of all contest's tasks by one query """
+        if self.tasks_grouping == TasksGroping.OneByOne:
+            return set(self.tasks_list.tasks.values_list('id', flat=True))
+        if self.tasks_grouping == TasksGroping.ByCategories:
+            return set(self.categories_list.categories.filter(tasks__isnull=False).values_list('tasks', flat=True))
+        return set()
+
     def get_tasks_solved_by_participant(self, participant):
         """ Returns task ids for solved by participant tasks """
         return set(self.attempts
@@ -165,11 +249,46 @@ class TaskBasedContest(Contest):
                        .values_list('task_id', flat=True)
                    )
 
+    def get_attempts_rate_limiter(self, participant):
+        """ Returns TokenBucket limiting participant's attempts in this contest """
+        return drapo.ratelimit.TokenBucket(
+            'drapo:contests:%d:attempts_rate_limit:%d' % (self.id, participant.id),
+            capacity=self.attempts_limit or settings.DRAPO_MAX_TRIES_IN_MINUTE,
+            period=self.attempts_limit_period or 60
+        )
+
+    def is_scoreboard_frozen(self):
+        """ Scoreboard is frozen since the freeze time and until the finish of the contest """
+        return (self.scoreboard_freeze_time is not None and self.scoreboard_freeze_time <= timezone.now() and
+                not self.is_finished())
+
+    def _get_opened_tasks_version_cache_keys(self, participant_id):
+        return (
+            'drapo:contests:%d:opened_tasks_version' % self.id,
+            'drapo:contests:%d:opened_tasks_version:%s' % (self.id, participant_id),
+        )
+
+    def get_opened_tasks_cache_key(self, participant_id):
+        """
+        Returns cache key for ids of tasks opened for the participant, participant_id is None for guests.
+        Key contains versions of contest's and participant's opened tasks, so it changes after invalidate_opened_tasks()
+        """
+        keys = self._get_opened_tasks_version_cache_keys(participant_id)
+        versions = cache.get_many(keys)
+        contest_version, participant_version = (versions.get(key) or _get_cache_version(key) for key in keys)
+        return 'drapo:contests:%d:opened_tasks:%d:%d:%s' % (self.id, contest_version, participant_version, participant_id)
+
+    def invalidate_opened_tasks(self, participant_id=None):
+        """ Invalidates cached opened tasks of the participant or of all participants if participant_id is None """
+        contest_key, participant_key = self._get_opened_tasks_version_cache_keys(participant_id)
+        _increment_cache_version(contest_key if participant_id is None else participant_key)
+
     def has_task(self, task):
+        """ Checks by one query, contest's tasks are not loaded """
         if self.tasks_grouping == TasksGroping.OneByOne:
-            return task in self.tasks
+            return task.contesttasks_set.filter(contest_id=self.id).exists()
         if self.tasks_grouping == TasksGroping.ByCategories:
-            return self.categories_list.categories.filter(tasks=task).exists()
+            return task.category_set.filter(contestcategories__contest_id=self.id).exists()
 
 
 class AbstractParticipant(polymorphic.models.PolymorphicModel, drapo.models.ModelWithTimestamps):
@@ -181,6 +300,17 @@ class AbstractParticipant(polymorphic.models.PolymorphicModel, drapo.models.Mode
 
     is_visible_in_scoreboard = models.BooleanField(default=True)
 
+    def save(self, *args, **kwargs):
+        # Scoreboard shows new participants and depends on their flags, other fields don't change it
+        is_scoreboard_changed = self._state.adding or not AbstractParticipant.objects.filter(
+            pk=self.pk,
+            is_visible_in_scoreboard=self.is_visible_in_scoreboard,
+            is_disqualified=self.is_disqualified,
+        ).exists()
+        super().save(*args, **kwargs)
+        if is_scoreboard_changed:
+            self.contest.invalidate_scoreboard()
+
     @property
     def name(self):
         return self.get_real_instance().name
@@ -221,6 +351,14 @@ class AbstractAdditionalScorer(polymorphic.models.PolymorphicModel):
     """ Defines additional scores policy """
     contest = models.ForeignKey(Contest, related_name='additional_scorers')
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.contest.invalidate_scoreboard()
+
+    def delete(self, *args, **kwargs):
+        super().delete(*args, **kwargs)
+        self.contest.invalidate_scoreboard()
+
 
 class ScoreByPlaceAdditionalScorer(AbstractAdditionalScorer):
     """ Additional scores to first solved task teams """
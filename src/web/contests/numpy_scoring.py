@@ -0,0 +1,139 @@
+"""
+Vectorized scoring for very large contests. Loads attempts' columns into numpy arrays and
+calculates the same results as contests.scoreboards does in pure python.
+numpy is optional: check is_available() before using this module
+"""
+import datetime
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+def is_available():
+    return numpy is not None
+
+
+def _first_in_groups(groups, *keys):
+    """
+    Sorts elements by group and then by keys. Returns array of groups and index of the first element for each group
+    """
+    # numpy.lexsort uses the last key as a primary one
+    order = numpy.lexsort(tuple(reversed(keys)) + (groups, ))
+    unique_groups, first_positions = numpy.unique(groups[order], return_index=True)
+    return unique_groups, order[first_positions]
+
+
+def calculate_results(participants, columns):
+    """
+    participants are the scoreboard participants ordered by id, columns are tuples
+    (participant_id, task_id, score, is_checked, is_correct, created_at) ordered by attempt's id.
+
+    Returns (results, scores, last_success_times, order) where results are the dicts
+    {task_id: (score, score_time, first_success_time, last_success_time, tries_count)} for each participant,
+    and order is the list of participants' indices in the scoreboard order
+    """
+    participant_ids, task_ids, scores, is_checked, is_correct, created_at = [], [], [], [], [], []
+    for column in columns:
+        participant_ids.append(column[0])
+        task_ids.append(column[1])
+        scores.append(column[2])
+        is_checked.append(column[3])
+        is_correct.append(column[4])
+        created_at.append(column[5])
+
+    participant_ids = numpy.array(participant_ids, dtype=numpy.int64)
+    task_ids = numpy.array(task_ids, dtype=numpy.int64)
+    scores = numpy.array(scores, dtype=numpy.int64)
+    is_checked = numpy.array(is_checked, dtype=bool)
+    is_correct = numpy.array(is_correct, dtype=bool)
+    times = numpy.array([(moment - _EPOCH) // _MICROSECOND for moment in created_at], dtype=numpy.int64)
+    attempts_order = numpy.arange(len(created_at))
+
+    # Pairs (participant, task) are sorted by participant and then by task
+    pairs, pair_of_attempt = numpy.unique(
+        numpy.stack([participant_ids, task_ids], axis=1).reshape(-1, 2),
+        axis=0,
+        return_inverse=True
+    )
+    pairs_count = len(pairs)
+    tries_count = numpy.bincount(pair_of_attempt, minlength=pairs_count)
+
+    # First checked attempt with maximal score for each pair
+    best_attempt = numpy.full(pairs_count, -1, dtype=numpy.int64)
+    checked = numpy.flatnonzero(is_checked)
+    groups, first = _first_in_groups(pair_of_attempt[checked], -scores[checked], attempts_order[checked])
+    best_attempt[groups] = checked[first]
+
+    # First and last correct attempts for each pair
+    first_success_attempt = numpy.full(pairs_count, -1, dtype=numpy.int64)
+    last_success_attempt = numpy.full(pairs_count, -1, dtype=numpy.int64)
+    correct = numpy.flatnonzero(is_correct)
+    groups, first = _first_in_groups(pair_of_attempt[correct], times[correct], attempts_order[correct])
+    first_success_attempt[groups] = correct[first]
+    groups, first = _first_in_groups(pair_of_attempt[correct], -times[correct], attempts_order[correct])
+    last_success_attempt[groups] = correct[first]
+
+    # Map pairs to the scoreboard participants. Attempts of other participants are ignored
+    scoreboard_participant_ids = numpy.array([p.id for p in participants], dtype=numpy.int64)
+    participants_count = len(scoreboard_participant_ids)
+    if participants_count > 0:
+        pair_participant = numpy.minimum(
+            numpy.searchsorted(scoreboard_participant_ids, pairs[:, 0]),
+            participants_count - 1
+        )
+        is_pair_visible = scoreboard_participant_ids[pair_participant] == pairs[:, 0]
+    else:
+        pair_participant = numpy.zeros(pairs_count, dtype=numpy.int64)
+        is_pair_visible = numpy.zeros(pairs_count, dtype=bool)
+
+    has_score = is_pair_visible & (best_attempt >= 0)
+    total_scores = numpy.zeros(participants_count, dtype=numpy.int64)
+    numpy.add.at(total_scores, pair_participant[has_score], scores[best_attempt[has_score]])
+
+    # Last success attempt for each participant
+    last_success_time = numpy.full(participants_count, -1, dtype=numpy.int64)
+    participant_last_success_attempt = numpy.full(participants_count, -1, dtype=numpy.int64)
+    is_pair_solved = is_pair_visible & (last_success_attempt >= 0)
+    solved_pairs_attempts = last_success_attempt[is_pair_solved]
+    groups, first = _first_in_groups(
+        pair_participant[is_pair_solved], -times[solved_pairs_attempts], solved_pairs_attempts
+    )
+    participant_last_success_attempt[groups] = solved_pairs_attempts[first]
+    last_success_time[groups] = times[solved_pairs_attempts[first]]
+
+    is_disqualified = numpy.array([p.is_disqualified for p in participants], dtype=bool)
+    # The same order as ScoreboardRow.sort_key, ties are broken by participant's id
+    order = numpy.lexsort((
+        numpy.arange(participants_count),
+        last_success_time,
+        last_success_time >= 0,
+        -total_scores,
+        is_disqualified,
+    ))
+
+    def get_time(attempt_index):
+        return created_at[attempt_index] if attempt_index >= 0 else None
+
+    results = [{} for _ in range(participants_count)]
+    for pair_index in numpy.flatnonzero(is_pair_visible):
+        best = best_attempt[pair_index]
+        results[pair_participant[pair_index]][int(pairs[pair_index, 1])] = (
+            int(scores[best]) if best >= 0 else None,
+            get_time(best),
+            get_time(first_success_attempt[pair_index]),
+            get_time(last_success_attempt[pair_index]),
+            int(tries_count[pair_index]),
+        )
+
+    return (
+        results,
+        [int(score) for score in total_scores],
+        [get_time(attempt_index) for attempt_index in participant_last_success_attempt],
+        [int(index) for index in order],
+    )
@@ -0,0 +1,589 @@
+import collections
+import operator
+
+from django.conf import settings
+from django.core import urlresolvers
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects, Count, Max
+from django.utils import timezone
+
+import taskbased.tasks.models as tasks_models
+from . import models
+from . import numpy_scoring
+
+
+class TaskResult:
+    """ Participant's result on one task, plain object for storing in the cache """
+    def __init__(self, score=None, score_time=None, first_success_time=None, last_success_time=None, tries_count=0):
+        self.score = score
+        self.score_time = score_time
+        self.first_success_time = first_success_time
+        self.last_success_time = last_success_time
+        self.tries_count = tries_count
+        # Points from additional scorers, i.e. for the first solving of the task
+        self.additional_score = 0
+
+    @property
+    def is_solved(self):
+        return self.first_success_time is not None
+
+    def add_attempt(self, score, is_checked, is_correct, created_at):
+        """ Attempts should be added in order of creation """
+        self.tries_count += 1
+        if is_checked and (self.score is None or score > self.score):
+            self.score = score
+            self.score_time = created_at
+        if is_correct:
+            if self.first_success_time is None or created_at < self.first_success_time:
+                self.first_success_time = created_at
+            if self.last_success_time is None or created_at > self.last_success_time:
+                self.last_success_time = created_at
+
+    def to_json(self):
+        return {
+            'score': self.score,
+            'additional_score': self.additional_score,
+            'is_solved': self.is_solved,
+        }
+
+
+class ScoreboardRow:
+    def __init__(self, participant, results, score, last_success_time):
+        self.participant_id = participant.id
+        self.name = participant.name
+        self.url = participant.get_absolute_url()
+        self.is_disqualified = participant.is_disqualified
+        # Dict from task id to TaskResult
+        self.results = dict(results)
+        self.score = score
+        self.last_success_time = last_success_time
+
+    @property
+    def sort_key(self):
+        return (
+            self.is_disqualified,  # First, show not-disqualified participants
+            -self.score,  # ordered by scores
+            # and by last success time, participants without success go first
+            self.last_success_time is not None,
+            self.last_success_time or 0,
+            self.participant_id,
+        )
+
+    def add_additional_score(self, task_id, points):
+        self.results[task_id].additional_score += points
+        self.score += points
+
+    def to_json(self, place):
+        return {
+            'place': place,
+            'participant_id': self.participant_id,
+            'name': self.name,
+            'is_disqualified': self.is_disqualified,
+            'score': self.score,
+            'last_success_time': self.last_success_time,
+            'tasks': {task_id: result.to_json() for task_id, result in self.results.items()},
+        }
+
+
+class ScoreboardColumn:
+    """ Task's column in the scoreboard table """
+    def __init__(self, contest, task, category=None):
+        self.task_id = task.id
+        self.max_score = task.max_score
+        if category is None:
+            self.title = '%d: %s' % (task.max_score, task.name)
+        else:
+            self.title = '%s %d: %s' % (category.name, task.max_score, task.name)
+        self.url = urlresolvers.reverse('contests:task', args=[contest.id, task.id])
+
+
+class ScoreboardCategoryHeader:
+    def __init__(self, category, colspan):
+        self.name = category.name
+        self.colspan = colspan
+
+
+class ScoreboardColumns:
+    """ Columns of the scoreboard table and category headers above them. Loaded by two queries at most """
+    def __init__(self, contest):
+        self.columns = []
+        self.category_headers = []
+        if contest.tasks_grouping == models.TasksGroping.OneByOne:
+            self.columns = [ScoreboardColumn(contest, task) for task in contest.tasks]
+        elif contest.tasks_grouping == models.TasksGroping.ByCategories:
+            for category in contest.categories_list.categories.prefetch_related('tasks'):
+                tasks = list(category.tasks.all())
+                if tasks:
+                    self.category_headers.append(ScoreboardCategoryHeader(category, len(tasks)))
+                self.columns.extend(ScoreboardColumn(contest, task, category) for task in tasks)
+        else:
+            raise ValueError('Invalid tasks grouping mode')
+
+
+class ScoreboardCell:
+    """ Values are formatted here, so the template only outputs strings """
+    def __init__(self, task_id, result):
+        self.task_id = str(task_id)
+        self.has_result = result is not None
+        if result is None or result.score is None:
+            self.score = self.score_time = ''
+        else:
+            self.score = str(result.score)
+            # strftime is much faster than django.utils.formats for thousands of cells
+            self.score_time = timezone.localtime(result.score_time).strftime('%Y-%m-%d %H:%M:%S')
+        self.additional_score = str(result.additional_score) if result is not None and result.additional_score else ''
+
+
+class ScoreboardTableRow:
+    """ Scoreboard row with cells prepared for the template, cells go in the same order as columns """
+    def __init__(self, place, row, columns, is_current):
+        self.place = place
+        self.participant_id = row.participant_id
+        self.name = row.name
+        self.url = row.url
+        self.is_disqualified = row.is_disqualified
+        self.score = row.score
+        self.is_current = is_current
+        self.cells = [ScoreboardCell(column.task_id, row.results.get(column.task_id)) for column in columns.columns]
+
+
+def build_table_rows(rows, columns, first_place, current_participant_id=None):
+    return [
+        ScoreboardTableRow(place, row, columns, row.participant_id == current_participant_id)
+        for place, row in enumerate(rows, start=first_place)
+    ]
+
+
+def _get_scoreboard_participants(contest):
+    participants = list(contest.participants.filter(is_visible_in_scoreboard=True).order_by('id'))
+    # Participant's name is taken from user or team, load them by one query instead of one query per participant
+    for participant_class, lookup in ((models.IndividualParticipant, 'user'), (models.TeamParticipant, 'team')):
+        prefetch_related_objects([p for p in participants if isinstance(p, participant_class)], lookup)
+    return participants
+
+
+def _build_rows(participants, results_by_participant):
+    rows = []
+    for participant in participants:
+        results = results_by_participant.get(participant.id, {})
+        rows.append(ScoreboardRow(
+            participant,
+            results,
+            score=sum(r.score for r in results.values() if r.score is not None),
+            last_success_time=max((r.last_success_time for r in results.values() if r.is_solved), default=None)
+        ))
+    rows.sort(key=operator.attrgetter('sort_key'))
+    return rows
+
+
+def _get_additional_points_by_place(contest):
+    points_by_place = collections.defaultdict(int)
+    for scorer in models.ScoreByPlaceAdditionalScorer.objects.filter(contest=contest):
+        points_by_place[scorer.place] += scorer.points
+    return points_by_place
+
+
+def _get_solve_places_from_rows(rows, max_place):
+    """ The same as ParticipantTaskResult.get_solve_places(), but for already calculated rows """
+    solves_by_task = collections.defaultdict(list)
+    for row in rows:
+        if row.is_disqualified:
+            continue
+        for task_id, result in row.results.items():
+            if result.is_solved:
+                solves_by_task[task_id].append((result.first_success_time, row.participant_id))
+
+    solve_places = []
+    for task_id, solves in solves_by_task.items():
+        solves.sort()
+        for place, (_, participant_id) in enumerate(solves[:max_place], start=1):
+            solve_places.append((task_id, participant_id, place))
+    return solve_places
+
+
+def _add_additional_scores(contest, rows, get_solve_places):
+    """
+    Applies contest's ScoreByPlaceAdditionalScorers to the rows and sorts them again.
+    get_solve_places(max_place) should return list of (task_id, participant_id, place)
+    """
+    points_by_place = _get_additional_points_by_place(contest)
+    if not points_by_place:
+        return rows
+
+    rows_by_participant = {row.participant_id: row for row in rows}
+    for task_id, participant_id, place in get_solve_places(max(points_by_place)):
+        if place in points_by_place and participant_id in rows_by_participant:
+            rows_by_participant[participant_id].add_additional_score(task_id, points_by_place[place])
+    rows.sort(key=operator.attrgetter('sort_key'))
+    return rows
+
+
+def calculate_scoreboard(contest):
+    """ Returns list of ScoreboardRow ordered by places """
+    results_by_participant = collections.defaultdict(dict)
+    for result in tasks_models.ParticipantTaskResult.objects.filter(contest=contest):
+        results_by_participant[result.participant_id][result.task_id] = TaskResult(
+            result.best_score,
+            result.best_score_time,
+            result.first_success_time,
+            result.last_success_time,
+            result.tries_count
+        )
+
+    rows = _build_rows(_get_scoreboard_participants(contest), results_by_participant)
+    return _add_additional_scores(
+        contest,
+        rows,
+        lambda max_place: tasks_models.ParticipantTaskResult.get_solve_places(contest, max_place)
+    )
+
+
+def _calculate_rows_from_attempts_columns(participants, columns):
+    results_by_participant = collections.defaultdict(lambda: collections.defaultdict(TaskResult))
+    for participant_id, task_id, score, is_checked, is_correct, created_at in columns:
+        results_by_participant[participant_id][task_id].add_attempt(score, is_checked, is_correct, created_at)
+
+    return _build_rows(participants, results_by_participant)
+
+
+def _calculate_rows_from_attempts_columns_with_numpy(participants, columns):
+    results, scores, last_success_times, order = numpy_scoring.calculate_results(participants, columns)
+    return [
+        ScoreboardRow(
+            participants[index],
+            {task_id: TaskResult(*result) for task_id, result in results[index].items()},
+            score=scores[index],
+            last_success_time=last_success_times[index]
+        )
+        for index in order
+    ]
+
+
+def calculate_scoreboard_from_attempts(contest, attempts, use_numpy=None):
+    """
+    Returns list of ScoreboardRow built from the attempts, not from materialized results.
+    Used for scoreboard at some moment in the past, i.e. at the freeze time.
+    For large contests calculation is vectorized with numpy if it's installed, see contests.numpy_scoring
+    """
+    columns = attempts.order_by('id').values_list(
+        'participant_id', 'task_id', 'score', 'is_checked', 'is_correct', 'created_at'
+    )
+    if use_numpy is None:
+        use_numpy = numpy_scoring.is_available() and attempts.count() >= settings.DRAPO_SCOREBOARD_NUMPY_MIN_ATTEMPTS
+
+    participants = _get_scoreboard_participants(contest)
+    if use_numpy:
+        rows = _calculate_rows_from_attempts_columns_with_numpy(participants, columns.iterator())
+    else:
+        rows = _calculate_rows_from_attempts_columns(participants, columns.iterator())
+    return _add_additional_scores(contest, rows, lambda max_place: _get_solve_places_from_rows(rows, max_place))
+
+
+def is_scoreboard_frozen_for_user(contest, user):
+    """ Staff always see the actual scoreboard """
+    return contest.is_scoreboard_frozen() and not user.is_staff
+
+
+def get_scoreboard_etag(contest, user):
+    """ Strong ETag, changes with the scoreboard version """
+    if is_scoreboard_frozen_for_user(contest, user):
+        return '"%d-frozen-%d"' % (contest.id, contest.scoreboard_freeze_time.timestamp())
+    return '"%d-%s"' % (contest.id, contest.get_scoreboard_version())
+
+
+def _get_live_scoreboard_cache_key(contest, version):
+    return 'drapo:contests:%d:scoreboard:%s' % (contest.id, version)
+
+
+def _get_frozen_scoreboard_cache_key(contest):
+    return 'drapo:contests:%d:frozen_scoreboard:%d' % (contest.id, contest.scoreboard_freeze_time.timestamp())
+
+
+def _get_page_cache_key(scoreboard_key, page_number):
+    return '%s:page:%d' % (scoreboard_key, page_number)
+
+
+def _get_places_cache_key(scoreboard_key):
+    return '%s:places' % scoreboard_key
+
+
+def _cache_scoreboard(key, rows, timeout):
+    """
+    Stores the scoreboard in the cache with its index: rows split by pages, number of rows
+    and one dict with places of all participants. So one page or participant's place can be read from the cache
+    without loading the whole scoreboard
+    """
+    page_size = settings.DRAPO_SCOREBOARD_PAGE_SIZE
+    values = {
+        key: rows,
+        key + ':count': len(rows),
+    }
+    for page_number, start in enumerate(range(0, len(rows), page_size), start=1):
+        values[_get_page_cache_key(key, page_number)] = rows[start:start + page_size]
+    values[_get_places_cache_key(key)] = {row.participant_id: place for place, row in enumerate(rows, start=1)}
+    cache.set_many(values, timeout=timeout)
+
+
+def get_live_scoreboard(contest, version=None):
+    """
+    Returns cached list of ScoreboardRow. Cache key contains scoreboard version,
+    so scoreboard is recalculated only after changes in the contest
+    """
+    if version is None:
+        version = contest.get_scoreboard_version()
+    key = _get_live_scoreboard_cache_key(contest, version)
+    rows = cache.get(key)
+    if rows is None:
+        rows = calculate_scoreboard(contest)
+        _cache_scoreboard(key, rows, timeout=settings.DRAPO_SCOREBOARD_CACHE_TIMEOUT)
+    return rows
+
+
+def _calculate_scoreboard_delta(old_rows, new_rows):
+    old_rows_by_participant = {row.participant_id: (place, row) for place, row in enumerate(old_rows, start=1)}
+    if len(old_rows) != len(new_rows):
+        return None
+
+    changed_rows = []
+    for place, row in enumerate(new_rows, start=1):
+        if row.participant_id not in old_rows_by_participant:
+            return None
+        old_place, old_row = old_rows_by_participant[row.participant_id]
+
+        changed_tasks = {
+            task_id: result.to_json()
+            for task_id, result in row.results.items()
+            if task_id not in old_row.results or result.to_json() != old_row.results[task_id].to_json()
+        }
+        if place != old_place or row.score != old_row.score or row.is_disqualified != old_row.is_disqualified or changed_tasks:
+            changed_rows.append({
+                'participant_id': row.participant_id,
+                'place': place,
+                'score': row.score,
+                'is_disqualified': row.is_disqualified,
+                'tasks': changed_tasks,
+            })
+
+    return changed_rows
+
+
+def get_scoreboard_delta(contest, old_version, new_version):
+    """
+    Returns list of changed rows between two versions of the live scoreboard or None
+    if delta can't be calculated (i.e. old scoreboard is not in the cache already or participants set has changed).
+    Delta is calculated once and cached, so all clients of the scoreboard stream share it
+    """
+    key = 'drapo:contests:%d:scoreboard_delta:%s:%s' % (contest.id, old_version, new_version)
+    delta = cache.get(key)
+    if delta is None:
+        old_rows = cache.get(_get_live_scoreboard_cache_key(contest, old_version))
+        if old_rows is None:
+            return None
+        new_rows = get_live_scoreboard(contest, new_version)
+        delta = {'rows': _calculate_scoreboard_delta(old_rows, new_rows)}
+        cache.set(key, delta, timeout=settings.DRAPO_SCOREBOARD_CACHE_TIMEOUT)
+    return delta['rows']
+
+
+def get_frozen_scoreboard(contest):
+    """
+    Returns scoreboard at the freeze time. It's calculated once and stored in the cache without timeout,
+    new attempts don't change it. Changing freeze time changes the cache key
+    """
+    key = _get_frozen_scoreboard_cache_key(contest)
+    rows = cache.get(key)
+    if rows is None:
+        attempts = contest.attempts.filter(created_at__lt=contest.scoreboard_freeze_time)
+        rows = calculate_scoreboard_from_attempts(contest, attempts)
+        _cache_scoreboard(key, rows, timeout=None)
+    return rows
+
+
+def get_scoreboard(contest, user):
+    if is_scoreboard_frozen_for_user(contest, user):
+        return get_frozen_scoreboard(contest)
+    return get_live_scoreboard(contest)
+
+
+def _get_scoreboard_cache_key(contest, user):
+    if is_scoreboard_frozen_for_user(contest, user):
+        return _get_frozen_scoreboard_cache_key(contest)
+    return _get_live_scoreboard_cache_key(contest, contest.get_scoreboard_version())
+
+
+def get_scoreboard_page(contest, user, page_number):
+    """
+    Returns (rows, rows_count) for the page, pages are numbered from 1.
+    Reads only this page from the cache, the whole scoreboard is loaded only if it's not calculated yet
+    """
+    key = _get_scoreboard_cache_key(contest, user)
+    page_key = _get_page_cache_key(key, page_number)
+    start = (page_number - 1) * settings.DRAPO_SCOREBOARD_PAGE_SIZE
+
+    values = cache.get_many([key + ':count', page_key])
+    if key + ':count' in values:
+        rows_count = values[key + ':count']
+        if page_key in values or start >= rows_count:
+            return values.get(page_key, []), rows_count
+
+    rows = get_scoreboard(contest, user)
+    return rows[start:start + settings.DRAPO_SCOREBOARD_PAGE_SIZE], len(rows)
+
+
+def get_participant_place(contest, user, participant_id):
+    """ Returns participant's place in the scoreboard or None if participant is not shown in the scoreboard """
+    places = cache.get(_get_places_cache_key(_get_scoreboard_cache_key(contest, user)))
+    if places is not None:
+        return places.get(participant_id)
+
+    # Index has been evicted or scoreboard is not calculated yet
+    for place, row in enumerate(get_scoreboard(contest, user), start=1):
+        if row.participant_id == participant_id:
+            return place
+    return None
+
+
+def get_scoreboard_rows_around(contest, user, place, count):
+    """ Returns (first_place, rows) for rows from place - count to place + count. Reads at most two pages """
+    page_size = settings.DRAPO_SCOREBOARD_PAGE_SIZE
+    count = min(count, page_size // 2)
+    first_place = max(place - count, 1)
+    last_place = place + count
+
+    first_page_number = (first_place - 1) // page_size + 1
+    rows = []
+    for page_number in range(first_page_number, (last_place - 1) // page_size + 2):
+        page_rows, _ = get_scoreboard_page(contest, user, page_number)
+        rows.extend(page_rows)
+
+    start = first_place - (first_page_number - 1) * page_size - 1
+    return first_place, rows[start:start + last_place - first_place + 1]
+
+
+class ScoreProgress:
+    """
+    Score changes of all participants over time. Built by one ordered pass over the contest's attempts.
+    Later only participants whose attempts have changed are replayed, also by one pass. Changes are found
+    by comparing number of attempts and their last update time for each participant: unlike a watermark on ids,
+    it notices attempts committed after the ones with bigger ids and old attempts checked or edited later
+    """
+    # Longer lists of participants are replayed by the pass over all attempts
+    max_participants_to_replay = 500
+
+    def __init__(self):
+        self.version = None
+        # participant_id -> (number of attempts, last update time)
+        self.fingerprints = {}
+        # participant_id -> {task_id: best score}
+        self.best_scores = {}
+        self.scores = collections.defaultdict(int)
+        # Lists of pairs (time, score) for each participant, without additional scores
+        self.attempts_points = {}
+        # Lists of pairs (time, points) for each participant, see ScoreByPlaceAdditionalScorer
+        self.additional_points = {}
+
+    def update(self, attempts):
+        fingerprints = {
+            participant_id: (count, updated_at)
+            for participant_id, count, updated_at in attempts.order_by().values('participant_id').annotate(
+                count=Count('id'), updated_at=Max('updated_at')
+            ).values_list('participant_id', 'count', 'updated_at')
+        }
+        changed_ids = {
+            participant_id
+            for participant_id in set(fingerprints) | set(self.fingerprints)
+            if fingerprints.get(participant_id) != self.fingerprints.get(participant_id)
+        }
+        if not changed_ids:
+            return
+
+        for participant_id in changed_ids:
+            self.best_scores.pop(participant_id, None)
+            self.scores.pop(participant_id, None)
+            self.attempts_points.pop(participant_id, None)
+        if len(changed_ids) <= self.max_participants_to_replay:
+            attempts = attempts.filter(participant_id__in=changed_ids)
+        self._add_attempts(attempts, changed_ids)
+        # Attempts committed after the first query are replayed next time: their fingerprints will differ
+        self.fingerprints = fingerprints
+
+    def _add_attempts(self, attempts, participants_ids):
+        columns = attempts.order_by('id').values_list('participant_id', 'task_id', 'score', 'is_checked', 'created_at')
+        for participant_id, task_id, score, is_checked, created_at in columns.iterator():
+            if not is_checked or participant_id not in participants_ids:
+                continue
+
+            best_scores = self.best_scores.setdefault(participant_id, {})
+            best_score = best_scores.get(task_id)
+            if best_score is None or score > best_score:
+                best_scores[task_id] = score
+                self.scores[participant_id] += score - (best_score or 0)
+                self.attempts_points.setdefault(participant_id, []).append((created_at, self.scores[participant_id]))
+
+    def get_points(self, participant_id):
+        """ Returns list of pairs (time, score) including additional scores """
+        attempts_points = self.attempts_points.get(participant_id, [])
+        additional_points = self.additional_points.get(participant_id, [])
+        if not additional_points:
+            return attempts_points
+
+        # Changes of the score, additional points go after the attempt made at the same time
+        changes = []
+        previous_score = 0
+        for time, score in attempts_points:
+            changes.append((time, 0, score - previous_score))
+            previous_score = score
+        changes.extend((time, 1, points) for time, points in additional_points)
+        changes.sort(key=operator.itemgetter(0, 1))
+
+        points = []
+        score = 0
+        for time, _, delta in changes:
+            score += delta
+            if points and points[-1][0] == time:
+                points[-1] = (time, score)
+            else:
+                points.append((time, score))
+        return points
+
+
+def _get_additional_points_over_time(contest):
+    """ Returns lists of pairs (time, points) for each participant, points are given at the solve time """
+    points_by_place = _get_additional_points_by_place(contest)
+    if not points_by_place:
+        return {}
+
+    points_by_solve = {
+        (task_id, participant_id): points_by_place[place]
+        for task_id, participant_id, place in tasks_models.ParticipantTaskResult.get_solve_places(
+            contest, max(points_by_place)
+        )
+        if place in points_by_place
+    }
+    additional_points = collections.defaultdict(list)
+    solves = tasks_models.ParticipantTaskResult.objects.filter(
+        contest=contest, first_success_time__isnull=False
+    ).values_list('task_id', 'participant_id', 'first_success_time')
+    for task_id, participant_id, first_success_time in solves:
+        if (task_id, participant_id) in points_by_solve:
+            additional_points[participant_id].append((first_success_time, points_by_solve[task_id, participant_id]))
+    return dict(additional_points)
+
+
+def get_score_progress(contest):
+    """ Returns ScoreProgress for the contest, replays only attempts of participants changed since the previous call """
+    key = 'drapo:contests:%d:score_progress_state' % contest.id
+    version = contest.get_scoreboard_version()
+
+    progress = cache.get(key)
+    if progress is not None and progress.version == version:
+        return progress
+
+    if progress is None:
+        progress = ScoreProgress()
+    progress.update(contest.attempts.all())
+    progress.additional_points = _get_additional_points_over_time(contest)
+    progress.version = version
+
+    cache.set(key, progress, timeout=settings.DRAPO_SCOREBOARD_CACHE_TIMEOUT)
+    return progress
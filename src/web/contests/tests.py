@@ -1,3 +1,721 @@
-from django.test import TestCase
+import datetime
+import json
+import random
+import unittest
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core import urlresolvers
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import models
+from . import numpy_scoring
+from . import scoreboards
+import taskbased.tasks.models as tasks_models
+import users.models as users_models
+
+
+# Tests which count queries or mock time.time() use per-process cache:
+# queries to the database cache would be counted too, and its entries expire by the mocked clock.
+# Tests of rate limits use per-process cache instead of memcached
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'default',
+    },
+    'ratelimit': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ratelimit',
+    },
+}
+
+
+def create_contest(**kwargs):
+    now = timezone.now()
+    contest_data = dict(
+        name='Contest',
+        is_visible_in_list=True,
+        registration_type=models.ContestRegistrationType.Open,
+        participation_mode=models.ContestParticipationMode.Individual,
+        start_time=now - datetime.timedelta(hours=1),
+        finish_time=now + datetime.timedelta(hours=1),
+        registration_start_time=now - datetime.timedelta(hours=1),
+        registration_finish_time=now + datetime.timedelta(hours=1),
+        short_description='Short description',
+        description='Description',
+        tasks_grouping=models.TasksGroping.OneByOne,
+    )
+    contest_data.update(kwargs)
+    contest = models.TaskBasedContest.objects.create(**contest_data)
+    tasks_models.ContestTasks.objects.create(contest=contest)
+    return contest
+
+
+def create_task(contest, answer, max_score=100):
+    task = tasks_models.Task.objects.create(
+        name='Task',
+        statement_generator=tasks_models.TextStatementGenerator.objects.create(title='Task', template='Statement'),
+        max_score=max_score,
+        checker=tasks_models.TextChecker.objects.create(answer=answer),
+    )
+    contest.tasks_list.tasks.add(task)
+    return task
+
+
+def create_participant(contest, username, **kwargs):
+    user = users_models.User.objects.create_user(username=username, email=username + '@example.com', password='')
+    return models.IndividualParticipant.objects.create(contest=contest, user=user, **kwargs)
+
+
+@unittest.skipUnless(numpy_scoring.is_available(), 'numpy is not installed')
+class NumpyScoringParityTest(TestCase):
+    def setUp(self):
+        self.random = random.Random(42)
+        self.contest = create_contest()
+        self.tasks = [create_task(self.contest, 'flag%d' % i) for i in range(6)]
+        self.participants = [
+            create_participant(
+                self.contest,
+                'user%d' % i,
+                is_disqualified=i % 7 == 3,
+                is_visible_in_scoreboard=i % 5 != 4
+            )
+            for i in range(20)
+        ]
+
+    def _create_attempts(self, count):
+        start_time = timezone.now() - datetime.timedelta(hours=1)
+        attempts = []
+        for _ in range(count):
+            task = self.random.choice(self.tasks)
+            is_checked = self.random.random() < 0.9
+            score = self.random.choice([0, 0, 10, 50, 100]) if is_checked else 0
+            attempts.append(tasks_models.Attempt(
+                contest=self.contest,
+                task=task,
+                participant=self.random.choice(self.participants),
+                author_id=self.participants[0].user_id,
+                answer='answer',
+                is_checked=is_checked,
+                is_correct=is_checked and score == task.max_score,
+                score=score,
+            ))
+        tasks_models.Attempt.objects.bulk_create(attempts)
+
+        # Few seconds range makes a lot of attempts with the same creation time
+        for attempt_id in self.contest.attempts.values_list('id', flat=True):
+            tasks_models.Attempt.objects.filter(id=attempt_id).update(
+                created_at=start_time + datetime.timedelta(seconds=self.random.randint(0, 30))
+            )
+
+    @staticmethod
+    def _rows_as_tuples(rows):
+        return [
+            (
+                row.participant_id,
+                row.is_disqualified,
+                row.score,
+                row.last_success_time,
+                {
+                    task_id: (r.score, r.score_time, r.first_success_time, r.last_success_time, r.tries_count)
+                    for task_id, r in row.results.items()
+                },
+            )
+            for row in rows
+        ]
+
+    def _assert_parity(self):
+        attempts = self.contest.attempts.all()
+        python_rows = scoreboards.calculate_scoreboard_from_attempts(self.contest, attempts, use_numpy=False)
+        numpy_rows = scoreboards.calculate_scoreboard_from_attempts(self.contest, attempts, use_numpy=True)
+        self.assertEqual(self._rows_as_tuples(python_rows), self._rows_as_tuples(numpy_rows))
+
+    def test_without_attempts(self):
+        self._assert_parity()
+
+    def test_random_attempts(self):
+        self._create_attempts(1000)
+        self._assert_parity()
+
+    def test_matches_materialized_results(self):
+        for place, points in [(1, 30), (2, 20), (3, 10), (3, 5)]:
+            models.ScoreByPlaceAdditionalScorer.objects.create(contest=self.contest, place=place, points=points)
+        self._create_attempts(300)
+        tasks_models.ParticipantTaskResult.rebuild_for_contest(self.contest)
+
+        materialized_rows = scoreboards.calculate_scoreboard(self.contest)
+        numpy_rows = scoreboards.calculate_scoreboard_from_attempts(
+            self.contest, self.contest.attempts.all(), use_numpy=True
+        )
+        self.assertEqual(self._rows_as_tuples(materialized_rows), self._rows_as_tuples(numpy_rows))
+
+
+class ScoreByPlaceAdditionalScorerTest(TestCase):
+    def setUp(self):
+        self.contest = create_contest()
+        self.task = create_task(self.contest, 'flag')
+        models.ScoreByPlaceAdditionalScorer.objects.create(contest=self.contest, place=1, points=3)
+        models.ScoreByPlaceAdditionalScorer.objects.create(contest=self.contest, place=2, points=2)
+
+    def _solve(self, participant, created_at):
+        attempt = tasks_models.Attempt.objects.create(
+            contest=self.contest,
+            task=self.task,
+            participant=participant,
+            author_id=participant.user_id,
+            answer='flag',
+            is_checked=True,
+            is_correct=True,
+            score=self.task.max_score,
+        )
+        tasks_models.Attempt.objects.filter(id=attempt.id).update(created_at=created_at)
+        tasks_models.ParticipantTaskResult.update(self.contest.id, participant.id, self.task.id)
+
+    def test_bonuses_by_solve_order(self):
+        first = create_participant(self.contest, 'first')
+        second = create_participant(self.contest, 'second')
+        third = create_participant(self.contest, 'third')
+        disqualified = create_participant(self.contest, 'disqualified', is_disqualified=True)
+
+        start_time = timezone.now() - datetime.timedelta(minutes=10)
+        self._solve(disqualified, start_time)
+        self._solve(third, start_time + datetime.timedelta(minutes=2))
+        self._solve(second, start_time + datetime.timedelta(minutes=1))
+        # Ties are broken by participant's id
+        self._solve(first, start_time + datetime.timedelta(minutes=1))
+
+        self.assertEqual(
+            sorted(tasks_models.ParticipantTaskResult.get_solve_places(self.contest, 2)),
+            [(self.task.id, first.id, 1), (self.task.id, second.id, 2)]
+        )
+
+        rows = scoreboards.calculate_scoreboard(self.contest)
+        self.assertEqual(
+            [(row.participant_id, row.score) for row in rows],
+            [(first.id, 103), (second.id, 102), (third.id, 100), (disqualified.id, 100)]
+        )
+        self.assertEqual(rows[0].results[self.task.id].additional_score, 3)
+
+        frozen_rows = scoreboards.calculate_scoreboard_from_attempts(self.contest, self.contest.attempts.all())
+        self.assertEqual(
+            [(row.participant_id, row.score) for row in frozen_rows],
+            [(row.participant_id, row.score) for row in rows]
+        )
+
+
+class ScoreProgressTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.contest = create_contest()
+        self.tasks = [create_task(self.contest, 'flag%d' % i) for i in range(2)]
+        self.participants = [create_participant(self.contest, 'user%d' % i) for i in range(2)]
+        self.start_time = timezone.now() - datetime.timedelta(hours=1)
+
+    def _create_attempt(self, participant, task, minutes, is_checked=True, **kwargs):
+        attempt = tasks_models.Attempt.objects.create(
+            contest=self.contest,
+            task=task,
+            participant=participant,
+            author_id=participant.user_id,
+            answer='flag',
+            is_checked=is_checked,
+            is_correct=is_checked,
+            score=task.max_score if is_checked else 0,
+            **kwargs
+        )
+        tasks_models.Attempt.objects.filter(id=attempt.id).update(
+            created_at=self.start_time + datetime.timedelta(minutes=minutes)
+        )
+        return attempt
+
+    def _get_scores(self, progress, participant):
+        return [score for _, score in progress.get_points(participant.id)]
+
+    def test_late_attempts(self):
+        first, second = self.participants
+        progress = scoreboards.ScoreProgress()
+        self._create_attempt(first, self.tasks[0], 1, id=100)
+        unchecked = self._create_attempt(second, self.tasks[0], 2, is_checked=False)
+        progress.update(self.contest.attempts.all())
+        self.assertEqual(self._get_scores(progress, first), [100])
+        self.assertEqual(self._get_scores(progress, second), [])
+
+        # Attempt with smaller id committed later and old attempt checked later
+        self._create_attempt(first, self.tasks[1], 3, id=50)
+        tasks_models.Attempt.objects.filter(id=unchecked.id).update(
+            is_checked=True, score=100, updated_at=timezone.now() + datetime.timedelta(seconds=1)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            progress.update(self.contest.attempts.all())
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(self._get_scores(progress, first), [100, 200])
+        self.assertEqual(self._get_scores(progress, second), [100])
+
+        with self.assertNumQueries(1):
+            progress.update(self.contest.attempts.all())
+
+    def test_additional_scores(self):
+        first, second = self.participants
+        models.ScoreByPlaceAdditionalScorer.objects.create(contest=self.contest, place=1, points=10)
+        for participant, minutes in [(first, 1), (second, 2)]:
+            self._create_attempt(participant, self.tasks[0], minutes)
+            tasks_models.ParticipantTaskResult.update(self.contest.id, participant.id, self.tasks[0].id)
+
+        progress = scoreboards.get_score_progress(self.contest)
+        self.assertEqual(self._get_scores(progress, first), [110])
+        self.assertEqual(self._get_scores(progress, second), [100])
+
+
+@override_settings(DRAPO_SCOREBOARD_PAGE_SIZE=3)
+class ScoreboardPaginationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.contest = create_contest()
+        self.task = create_task(self.contest, 'flag')
+        self.participants = [create_participant(self.contest, 'user%d' % i) for i in range(8)]
+        for index, participant in enumerate(self.participants):
+            tasks_models.Attempt.objects.create(
+                contest=self.contest,
+                task=self.task,
+                participant=participant,
+                author_id=participant.user_id,
+                answer='answer',
+                is_checked=True,
+                is_correct=False,
+                score=index,
+            )
+        tasks_models.ParticipantTaskResult.rebuild_for_contest(self.contest)
+        self.user = AnonymousUser()
+
+    def test_pages(self):
+        rows = scoreboards.get_scoreboard(self.contest, self.user)
+        pages = [scoreboards.get_scoreboard_page(self.contest, self.user, page_number) for page_number in range(1, 5)]
+
+        self.assertEqual([len(page_rows) for page_rows, _ in pages], [3, 3, 2, 0])
+        self.assertEqual({rows_count for _, rows_count in pages}, {8})
+        self.assertEqual(
+            [row.participant_id for page_rows, _ in pages for row in page_rows],
+            [row.participant_id for row in rows]
+        )
+
+    def test_page_without_calculated_scoreboard(self):
+        page_rows, rows_count = scoreboards.get_scoreboard_page(self.contest, self.user, 2)
+        self.assertEqual(rows_count, 8)
+        self.assertEqual([row.participant_id for row in page_rows], [p.id for p in self.participants[4:1:-1]])
+
+    def test_around_participant(self):
+        participant = self.participants[3]
+        place = scoreboards.get_participant_place(self.contest, self.user, participant.id)
+        self.assertEqual(place, 5)
+
+        first_place, rows = scoreboards.get_scoreboard_rows_around(self.contest, self.user, place, 1)
+        self.assertEqual(first_place, 4)
+        self.assertEqual([row.participant_id for row in rows], [p.id for p in self.participants[4:1:-1]])
+
+        # Rows from two pages
+        first_place, rows = scoreboards.get_scoreboard_rows_around(self.contest, self.user, 3, 1)
+        self.assertEqual(first_place, 2)
+        self.assertEqual([row.participant_id for row in rows], [p.id for p in self.participants[6:3:-1]])
+
+        first_place, rows = scoreboards.get_scoreboard_rows_around(self.contest, self.user, 1, 1)
+        self.assertEqual(first_place, 1)
+        self.assertEqual([row.participant_id for row in rows], [p.id for p in self.participants[7:5:-1]])
+
+    def test_place_after_index_eviction(self):
+        scoreboards.get_scoreboard(self.contest, self.user)
+        key = scoreboards._get_scoreboard_cache_key(self.contest, self.user)
+        cache.delete(key + ':places')
+        self.assertEqual(scoreboards.get_participant_place(self.contest, self.user, self.participants[3].id), 5)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ScoreboardRenderingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.contest = create_contest()
+        self.tasks = [create_task(self.contest, 'flag%d' % i) for i in range(3)]
+
+    def _add_participants(self, count):
+        for _ in range(count):
+            participant = create_participant(self.contest, 'user%d' % self.contest.participants.count())
+            for task in self.tasks:
+                tasks_models.Attempt.objects.create(
+                    contest=self.contest,
+                    task=task,
+                    participant=participant,
+                    author_id=participant.user_id,
+                    answer='flag',
+                    is_checked=True,
+                    is_correct=True,
+                    score=task.max_score,
+                )
+                tasks_models.ParticipantTaskResult.update(self.contest.id, participant.id, task.id)
+
+    def _count_queries(self):
+        url = urlresolvers.reverse('contests:scoreboard', args=[self.contest.id])
+        # Calculate the scoreboard and put it into the cache
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return len(queries), response
+
+    def test_queries_count_does_not_depend_on_participants_count(self):
+        self._add_participants(2)
+        queries_count, response = self._count_queries()
+        self.assertContains(response, 'data-task-id="%d"' % self.tasks[0].id, count=2)
+
+        self._add_participants(5)
+        self.assertEqual(self._count_queries()[0], queries_count)
+
+
+# Cached data is invalidated after the commit, so each change must be really committed
+class ScoreboardChangesTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.contest = create_contest()
+        self.task = create_task(self.contest, 'flag')
+        self.participants = [create_participant(self.contest, 'user%d' % i) for i in range(2)]
+        self.url = urlresolvers.reverse('contests:scoreboard_changes', args=[self.contest.id])
+
+    def _get_changes(self, version):
+        return json.loads(self.client.get(self.url, {'version': version}).content.decode())
+
+    def test_delta(self):
+        version = self.contest.get_scoreboard_version()
+        scoreboards.get_live_scoreboard(self.contest)
+        self.assertEqual(self._get_changes(version), {'event': 'none', 'version': version})
+
+        tasks_models.Attempt(
+            contest=self.contest, task=self.task, participant=self.participants[1],
+            author_id=self.participants[1].user_id, answer='flag',
+        ).submit()
+        changes = self._get_changes(version)
+        self.assertEqual(changes['event'], 'delta')
+        self.assertEqual(changes['version'], self.contest.get_scoreboard_version())
+        self.assertEqual([row['participant_id'] for row in changes['rows']], [p.id for p in reversed(self.participants)])
+
+    def test_scoreboard_is_not_calculated_for_unknown_version(self):
+        version = self.contest.get_scoreboard_version() - 1000
+        with mock.patch.object(scoreboards, 'calculate_scoreboard') as calculate_scoreboard:
+            self.assertEqual(self._get_changes(version)['event'], 'reload')
+            self.assertEqual(self._get_changes(version + 2000)['event'], 'reload')
+            self.assertEqual(self._get_changes('bad')['event'], 'reload')
+        calculate_scoreboard.assert_not_called()
+
+    def test_participant_flags_invalidate_scoreboard(self):
+        participant = self.participants[0]
+        version = self.contest.get_scoreboard_version()
+        participant.is_approved = False
+        participant.save()
+        self.assertEqual(self.contest.get_scoreboard_version(), version)
+
+        participant.is_disqualified = True
+        participant.save()
+        self.assertNotEqual(self.contest.get_scoreboard_version(), version)
+
+        version = self.contest.get_scoreboard_version()
+        participant.is_visible_in_scoreboard = False
+        participant.save()
+        self.assertNotEqual(self.contest.get_scoreboard_version(), version)
+
+    def test_deleted_task_is_removed_from_scoreboard(self):
+        tasks_models.Attempt(
+            contest=self.contest, task=self.task, participant=self.participants[0],
+            author_id=self.participants[0].user_id, answer='flag',
+        ).submit()
+        self.assertEqual(scoreboards.get_live_scoreboard(self.contest)[0].score, 100)
+
+        staff = users_models.User.objects.create_user(username='staff', email='staff@example.com', is_staff=True)
+        self.client.force_login(staff)
+        self.client.post(urlresolvers.reverse('contests:delete_task', args=[self.contest.id, self.task.id]))
+        self.assertEqual([row.score for row in scoreboards.get_live_scoreboard(self.contest)], [0, 0])
+
+    def test_freeze_is_noticed(self):
+        version = self.contest.get_scoreboard_version()
+        models.TaskBasedContest.objects.filter(pk=self.contest.id).update(
+            scoreboard_freeze_time=timezone.now() - datetime.timedelta(minutes=1)
+        )
+        self.assertEqual(self._get_changes(version), {'event': 'frozen'})
+
+
+class FrozenScoreboardTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.contest = create_contest(scoreboard_freeze_time=timezone.now() - datetime.timedelta(minutes=1))
+        self.task = create_task(self.contest, 'flag')
+        self.participant = create_participant(self.contest, 'user')
+        self.staff = users_models.User.objects.create_user(username='staff', email='staff@example.com', is_staff=True)
+        # Attempt is sent after the freeze time
+        tasks_models.Attempt(
+            contest=self.contest, task=self.task, participant=self.participant,
+            author_id=self.participant.user_id, answer='flag',
+        ).submit()
+
+    def _get_scores(self, user):
+        return [row.score for row in scoreboards.get_scoreboard(self.contest, user)]
+
+    def test_participants_see_snapshot(self):
+        self.assertEqual(self._get_scores(self.participant.user), [0])
+        self.assertEqual(self._get_scores(AnonymousUser()), [0])
+
+    def test_staff_see_live_scoreboard(self):
+        self.assertEqual(self._get_scores(self.staff), [100])
+
+    def test_everyone_sees_live_scoreboard_after_finish(self):
+        self.assertEqual(self._get_scores(self.participant.user), [0])
+        self.contest.finish_time = timezone.now() - datetime.timedelta(seconds=1)
+        self.contest.save()
+        self.assertEqual(self._get_scores(self.participant.user), [100])
+        self.assertEqual(self._get_scores(AnonymousUser()), [100])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AttemptsRateLimitTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['ratelimit'].clear()
+        self.contest = create_contest(attempts_limit=3, attempts_limit_period=60)
+        self.participant = create_participant(self.contest, 'user')
+        self.now = 1000000.0
+
+    def _try_acquire(self, count):
+        with mock.patch('drapo.ratelimit.time.time', return_value=self.now):
+            limiter = self.contest.get_attempts_rate_limiter(self.participant)
+            return [limiter.try_acquire() for _ in range(count)]
+
+    def test_token_bucket(self):
+        self.assertEqual(self._try_acquire(4), [True, True, True, False])
+        # Rejected attempts don't take tokens, one token is refilled in 20 seconds
+        self.now += 20
+        self.assertEqual(self._try_acquire(2), [True, False])
+        # Bucket is refilled, but it can't contain more than 3 tokens
+        self.now += 1000
+        self.assertEqual(self._try_acquire(4), [True, True, True, False])
+
+    def test_limiter_does_not_query_database(self):
+        with self.assertNumQueries(0):
+            self._try_acquire(4)
+
+    def test_limits_are_per_participant(self):
+        other_participant = create_participant(self.contest, 'other')
+        self.assertEqual(self._try_acquire(4), [True, True, True, False])
+        with mock.patch('drapo.ratelimit.time.time', return_value=self.now):
+            self.assertTrue(self.contest.get_attempts_rate_limiter(other_participant).try_acquire())
+
+    def test_bucket_is_not_refilled_by_new_period_key(self):
+        # Last second of the period, tokens are taken
+        self.now = 60 * 20000 - 1
+        self.assertEqual(self._try_acquire(3), [True, True, True])
+        # Bucket's state is continued in the key of the next period
+        self.now += 2
+        self.assertEqual(self._try_acquire(1), [False])
+
+    def test_invalid_answer_does_not_take_token(self):
+        task = create_task(self.contest, 'flag')
+        tasks_models.AllTasksOpenedOpeningPolicy.objects.create(contest=self.contest)
+        self.client.force_login(self.participant.user)
+        url = urlresolvers.reverse('contests:task', args=[self.contest.id, task.id])
+        with mock.patch('drapo.ratelimit.time.time', return_value=self.now):
+            for _ in range(5):
+                self.client.post(url, {'answer': ''})
+        self.assertEqual(self._try_acquire(4), [True, True, True, False])
+
+
+@override_settings(
+    DRAPO_IP_RATE_LIMITS=[('task', r'^/contests/\d+/tasks/\d+/$', 2, 60)],
+    CACHES=LOCMEM_CACHES,
+)
+class IpRateLimitMiddlewareTest(TestCase):
+    def setUp(self):
+        caches['ratelimit'].clear()
+
+    def test_rejects_flood_before_view(self):
+        url = '/contests/1/tasks/1/'
+        with CaptureQueriesContext(connection) as queries:
+            statuses = [self.client.get(url, REMOTE_ADDR='10.0.0.1').status_code for _ in range(3)]
+            rejected_queries_count = len(queries)
+            response = self.client.get(url, REMOTE_ADDR='10.0.0.1')
+            self.assertEqual(len(queries), rejected_queries_count)
+
+        # There is no such contest, but the view runs for the first two requests
+        self.assertEqual(statuses, [404, 404, 429])
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+        # Other addresses and other routes are not limited
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.2').status_code, 404)
+        self.assertEqual(self.client.get('/contests/1/', REMOTE_ADDR='10.0.0.1').status_code, 404)
+
+    def test_spoofed_forwarded_for_is_ignored(self):
+        url = '/contests/1/tasks/1/'
+        statuses = [
+            self.client.get(url, REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='192.168.0.%d' % i).status_code
+            for i in range(3)
+        ]
+        self.assertEqual(statuses, [404, 404, 429])
+
+    @override_settings(DRAPO_TRUSTED_PROXY_COUNT=1)
+    def test_address_from_trusted_proxy(self):
+        url = '/contests/1/tasks/1/'
+        statuses = [
+            self.client.get(url, REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='192.168.0.%d, 10.0.0.2' % i).status_code
+            for i in range(3)
+        ]
+        self.assertEqual(statuses, [404, 404, 429])
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='10.0.0.3').status_code, 404)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SubmitAttemptsApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['ratelimit'].clear()
+        self.contest = create_contest(attempts_limit=3)
+        self.tasks = [create_task(self.contest, 'flag%d' % i) for i in range(2)]
+        tasks_models.AllTasksOpenedOpeningPolicy.objects.create(contest=self.contest)
+        self.participant = create_participant(self.contest, 'user')
+        self.token = users_models.ApiToken.objects.create(user=self.participant.user).token
+        self.url = urlresolvers.reverse('contests:submit_attempts', args=[self.contest.id])
+
+    def _submit(self, attempts, token=None):
+        return self.client.post(
+            self.url,
+            json.dumps({'attempts': attempts}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION='Token %s' % (token or self.token)
+        )
+
+    def test_verdicts(self):
+        other_contest = create_contest()
+        other_task = create_task(other_contest, 'flag')
+
+        response = self._submit([
+            {'task': self.tasks[0].id, 'answer': 'FLAG0'},
+            {'task': self.tasks[1].id, 'answer': 'wrong'},
+            {'task': other_task.id, 'answer': 'flag'},
+            {'task': 'invalid', 'answer': 'flag'},
+            {'task': self.tasks[1].id, 'answer': 'flag1'},
+            {'task': self.tasks[1].id, 'answer': 'flag1'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [verdict['status'] for verdict in response.json()['attempts']],
+            ['correct', 'wrong', 'rejected', 'rejected', 'correct', 'rejected']
+        )
+        # Three attempts are allowed by the rate limit
+        self.assertEqual(self.contest.attempts.count(), 3)
+        self.assertEqual(
+            tasks_models.ParticipantTaskResult.objects.get(participant=self.participant, task=self.tasks[1]).tries_count,
+            2
+        )
+
+    def test_invalid_token(self):
+        self.assertEqual(self._submit([], token='invalid').status_code, 401)
+
+    def test_invalid_request(self):
+        response = self.client.post(
+            self.url, '{"attempts": 1}', content_type='application/json', HTTP_AUTHORIZATION='Token ' + self.token
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class JudgeQueueTest(TestCase):
+    def setUp(self):
+        self.contest = create_contest()
+        self.task = create_task(self.contest, 'flag')
+        self.task.checker = tasks_models.ManualChecker.objects.create()
+        self.task.save()
+        self.attempts = []
+        for i in range(2):
+            participant = create_participant(self.contest, 'user%d' % i)
+            attempt = tasks_models.Attempt(
+                contest=self.contest, task=self.task, participant=participant, author=participant.user, answer='essay'
+            )
+            attempt.submit()
+            self.attempts.append(attempt)
+        self.judges = [
+            users_models.User.objects.create_user(username='judge%d' % i, email='judge%d@example.com' % i, is_staff=True)
+            for i in range(2)
+        ]
+
+    def test_judges_get_different_attempts(self):
+        first = tasks_models.Attempt.claim_for_judge(self.contest, self.judges[0])
+        second = tasks_models.Attempt.claim_for_judge(self.contest, self.judges[1])
+        self.assertEqual({first.id, second.id}, {attempt.id for attempt in self.attempts})
+        # Judge gets the same attempt until it's checked
+        self.assertEqual(tasks_models.Attempt.claim_for_judge(self.contest, self.judges[0]).id, first.id)
+        self.assertIsNone(tasks_models.Attempt.claim_for_judge(self.contest, create_participant(self.contest, 'x').user))
+
+    def test_verdict_is_saved_once(self):
+        attempt = self.attempts[0]
+        url = urlresolvers.reverse('contests:judge_attempt', args=[self.contest.id, attempt.id])
+        self.client.force_login(self.judges[0])
+        response = self.client.get(urlresolvers.reverse('contests:judge', args=[self.contest.id]))
+        self.assertContains(response, url)
+        self.client.post(url, {'verdict': 'accept'})
+        self.client.force_login(self.judges[1])
+        self.client.post(url, {'verdict': 'reject'})
+
+        attempt.refresh_from_db()
+        self.assertTrue(attempt.is_checked)
+        self.assertTrue(attempt.is_correct)
+        self.assertEqual(attempt.score, self.task.max_score)
+        self.assertEqual(attempt.judge, self.judges[0])
+        self.assertTrue(tasks_models.ParticipantTaskResult.objects.get(participant_id=attempt.participant_id).is_solved)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SubmissionQueriesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.contest = create_contest()
+        self.tasks = [create_task(self.contest, 'flag%d' % i) for i in range(10)]
+        tasks_models.AllTasksOpenedOpeningPolicy.objects.create(contest=self.contest)
+        self.participant = create_participant(self.contest, 'user')
+        self.client.force_login(self.participant.user)
+        self.url = urlresolvers.reverse('contests:task', args=[self.contest.id, self.tasks[5].id])
+
+    # Session, user, contest, task, has_task(), participant (2), policies (2) and contest's tasks (2) if opened tasks
+    # are not cached yet, checker (2), INSERT of attempt, ParticipantTaskResult.update() (SELECT FOR UPDATE,
+    # INSERT with savepoint for the first attempt, 2 SELECTs and UPDATE), solved tasks and opening policy
+    # if the task becomes solved
+    max_queries = 21
+
+    def _submit(self, answer):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'answer': answer})
+        self.assertEqual(response.status_code, 302)
+        return [query['sql'] for query in queries.captured_queries]
+
+    def test_submission_queries(self):
+        for answer in ['wrong', 'flag5']:
+            queries = self._submit(answer)
+            self.assertLessEqual(len(queries), self.max_queries)
+            # Attempt is saved with its verdict by one INSERT
+            self.assertEqual(len([query for query in queries if query.startswith('INSERT INTO "tasks_attempt"')]), 1)
+            self.assertFalse(any(query.startswith('UPDATE "tasks_attempt"') for query in queries))
+
+        result = tasks_models.ParticipantTaskResult.objects.get(participant=self.participant)
+        self.assertEqual(result.tries_count, 2)
+        self.assertTrue(result.is_solved)
+
+
+
+# Same submissions with the database cache from settings. Memcached for rate limits is replaced by per-process cache,
+# which doesn't query the database too
+@override_settings(CACHES=dict(LOCMEM_CACHES, default=settings.CACHES['default']))
+class DatabaseCacheSubmissionQueriesTest(SubmissionQueriesTest):
+    # Queries above and the database cache: up to 7 reads of opened tasks and remembered verdicts with their versions,
+    # each write is COUNT(*) for culling, SELECT and INSERT in a savepoint. Caches are empty for the first submission,
+    # so it writes versions of opened tasks (2), opened tasks, version of remembered verdicts and the verdict
+    max_queries = 57
+
+    def _submit(self, answer):
+        queries = super()._submit(answer)
+        self.assertFalse(any('attempts_rate_limit' in query for query in queries))
+        return queries
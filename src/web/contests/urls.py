@@ -24,8 +24,16 @@ urlpatterns = [
     url(r'^(?P<contest_id>\d+)/categories/(?P<category_id>\d+)/edit/$', views.edit_category, name='edit_category'),
     url(r'^(?P<contest_id>\d+)/categories/(?P<category_id>\d+)/delete/$', views.delete_category, name='delete_category'),
     url(r'^(?P<contest_id>\d+)/scoreboard/$', views.scoreboard, name='scoreboard'),
+    url(r'^(?P<contest_id>\d+)/scoreboard/me/$', views.scoreboard_around_me, name='scoreboard_around_me'),
+    url(r'^(?P<contest_id>\d+)/scoreboard/json/$', views.scoreboard_json, name='scoreboard_json'),
+    url(r'^(?P<contest_id>\d+)/scoreboard/progress/$', views.scoreboard_progress, name='scoreboard_progress'),
+    url(r'^(?P<contest_id>\d+)/scoreboard/changes/$', views.scoreboard_changes, name='scoreboard_changes'),
     url(r'^(?P<contest_id>\d+)/attempts/$', views.attempts, name='attempts'),
+    url(r'^(?P<contest_id>\d+)/attempts/submit/$', views.submit_attempts, name='submit_attempts'),
+    url(r'^(?P<contest_id>\d+)/attempts/judge/$', views.judge, name='judge'),
     url(r'^(?P<contest_id>\d+)/attempts/(?P<attempt_id>\d+)/$', views.attempt, name='attempt'),
+    url(r'^(?P<contest_id>\d+)/attempts/(?P<attempt_id>\d+)/status/$', views.attempt_status, name='attempt_status'),
+    url(r'^(?P<contest_id>\d+)/attempts/(?P<attempt_id>\d+)/judge/$', views.judge_attempt, name='judge_attempt'),
 
     url(r'^(?P<contest_id>\d+)/news/add/$', views.add_news, name='add_news'),
     url(r'^(?P<contest_id>\d+)/news/(?P<news_id>\d+)/$', views.news, name='news'),
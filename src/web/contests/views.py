@@ -1,18 +1,21 @@
 import copy
-import itertools
 import operator
 import re
-import collections
 import datetime
+import json
 
 from django.contrib import messages
 from django.core import urlresolvers
 from django.db import transaction
 from django.db.models.query_utils import Q
-from django.http.response import Http404, HttpResponseNotFound, HttpResponseForbidden, JsonResponse
+from django.http.response import Http404, HttpResponseNotFound, HttpResponseForbidden, JsonResponse, \
+    HttpResponseBadRequest
 from django.shortcuts import render, get_object_or_404, redirect
+from django.utils.cache import get_conditional_response
+from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.conf import settings
+from django.core.cache import cache
 
 from drapo.common import respond_as_attachment
 from drapo.uploads import save_uploaded_file
@@ -20,21 +23,13 @@ from users.decorators import login_required, staff_required
 import users.models as users_models
 from . import models
 from . import forms
+from . import scoreboards
 import teams.models as teams_models
 import taskbased.categories.models as categories_models
 import taskbased.tasks.models as tasks_models
 import taskbased.tasks.forms as tasks_forms
 
 
-def _groupby(iterable, keyfunc):
-    result = collections.defaultdict(list)
-    for item in iterable:
-        key = keyfunc(item)
-        result[key].append(item)
-
-    return result
-
-
 def is_manual_task_opening_available_in_contest(contest):
     return contest.tasks_opening_policies.instance_of(tasks_models.ManualTasksOpeningPolicy).exists()
 
@@ -154,12 +149,7 @@ def tasks(request, contest_id):
     else:
         participant = None
 
-    # Iterate all policies, collect opened tasks
-    opened_tasks_ids = set(
-        itertools.chain.from_iterable(
-            policy.get_open_tasks(participant) for policy in contest.tasks_opening_policies.all()
-        )
-    )
+    opened_tasks_ids = get_opened_tasks_ids(contest, participant)
 
     if contest.tasks_grouping == models.TasksGroping.OneByOne:
         tasks = contest.tasks
@@ -183,110 +173,213 @@ def tasks(request, contest_id):
         })
 
 
+def _get_page_number(request):
+    try:
+        return max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        return 1
+
+
+def _render_scoreboard(request, contest, version, first_place, rows, extra_context):
+    participant = contest.get_participant_for_user(request.user)
+    columns = scoreboards.ScoreboardColumns(contest)
+
+    context = {
+        'current_contest': contest,
+
+        'contest': contest,
+        'columns': columns,
+        'rows': scoreboards.build_table_rows(
+            rows, columns, first_place, participant.id if participant is not None else None
+        ),
+        'first_place': first_place,
+        'last_place': first_place + len(rows) - 1,
+        'participant': participant,
+        'is_frozen': contest.is_scoreboard_frozen(),
+        'is_frozen_for_user': scoreboards.is_scoreboard_frozen_for_user(contest, request.user),
+        'version': version,
+        'poll_interval': settings.DRAPO_SCOREBOARD_POLL_INTERVAL * 1000,
+    }
+    context.update(extra_context)
+    return render(request, 'contests/scoreboard.html', context)
+
+
 def scoreboard(request, contest_id):
     contest = get_object_or_404(models.TaskBasedContest, pk=contest_id)
     if not contest.is_visible_in_list and not request.user.is_staff:
         return HttpResponseNotFound()
 
-    participants = list(contest.participants.filter(is_visible_in_scoreboard=True))
-
-
-    attempts_by_participant = _groupby(contest.attempts.all(), operator.attrgetter('participant_id'))
-    attempts_by_participant = collections.defaultdict(list, attempts_by_participant)
-
-    attempts_by_participant_and_task = {
-        p.id: collections.defaultdict(
-            list,
-            _groupby(attempts_by_participant[p.id], operator.attrgetter('task_id'))
-        )
-        for p in participants
-        }
-
-    # Stores first success attempt for each pair (participant, task) or None if there is no success tries
-    first_success_attempt_by_participant_and_task = {
-        p.id: collections.defaultdict(
-            lambda: None,
-            {
-                # For each task_id filter only correct attempts and select first created
-                task_id: min(
-                    filter(operator.attrgetter('is_correct'), attempts),
-                    key=lambda a: a.created_at,
-                    default=None
-                )
-                for task_id, attempts in attempts_by_participant_and_task[p.id].items()
-                }
-        )
-        for p in participants
-        }
-
-    max_scored_attempt_by_participant_and_task = {
-        p.id: collections.defaultdict(
-            None,
-            {
-                # For each task_id filter only checked attempts and select one with max score
-                task_id: max(
-                    filter(operator.attrgetter('is_checked'), attempts),
-                    key=lambda a: a.score,
-                    default=None
-                )
-                for task_id, attempts in attempts_by_participant_and_task[p.id].items()
-                }
-        )
-        for p in participants
-        }
-
-    scores_by_participant = {
-        p.id: sum(a.score for a in max_scored_attempt_by_participant_and_task[p.id].values() if a is not None)
-        for p in participants
-        }
-
-    last_success_time_by_participant = {
-        p.id: max((a.created_at for a in attempts_by_participant[p.id] if a.is_correct), default=0)
-        for p in participants
-        }
-
-    ordered_participants = sorted(participants,
-                                  key=lambda p: (
-                                      p.is_disqualified,  # First, show not-disqualified participants
-                                      -scores_by_participant[p.id],  # ordered by scores
-                                      last_success_time_by_participant[p.id]  # and by last success time
-                                  ))
-
-    tasks = categories = None
-    if contest.tasks_grouping == models.TasksGroping.OneByOne:
-        tasks = contest.tasks
-        with_categories = False
-    elif contest.tasks_grouping == models.TasksGroping.ByCategories:
-        categories = contest.categories
-        with_categories = True
+    # Get version before the scoreboard: deltas from scoreboard_changes contain absolute values,
+    # so it's safe if scoreboard is newer than its version
+    version = contest.get_scoreboard_version()
+
+    page_size = settings.DRAPO_SCOREBOARD_PAGE_SIZE
+    page_number = _get_page_number(request)
+    rows, rows_count = scoreboards.get_scoreboard_page(contest, request.user, page_number)
+    pages_count = max((rows_count + page_size - 1) // page_size, 1)
+    if page_number > pages_count:
+        return redirect(urlresolvers.reverse('contests:scoreboard', args=[contest.id]) + '?page=%d' % pages_count)
+
+    return _render_scoreboard(request, contest, version, (page_number - 1) * page_size + 1, rows, {
+        'page_number': page_number,
+        'pages': range(1, pages_count + 1),
+    })
+
+
+def scoreboard_around_me(request, contest_id):
+    contest = get_object_or_404(models.TaskBasedContest, pk=contest_id)
+    if not contest.is_visible_in_list and not request.user.is_staff:
+        return HttpResponseNotFound()
+
+    participant = contest.get_participant_for_user(request.user)
+    if participant is None:
+        messages.error(request, 'You are not a participant of %s' % contest.name)
+        return redirect(urlresolvers.reverse('contests:scoreboard', args=[contest.id]))
+
+    version = contest.get_scoreboard_version()
+    place = scoreboards.get_participant_place(contest, request.user, participant.id)
+    if place is None:
+        messages.error(request, 'You are not shown in the scoreboard')
+        return redirect(urlresolvers.reverse('contests:scoreboard', args=[contest.id]))
+
+    first_place, rows = scoreboards.get_scoreboard_rows_around(
+        contest, request.user, place, settings.DRAPO_SCOREBOARD_AROUND_ME_ROWS
+    )
+    return _render_scoreboard(request, contest, version, first_place, rows, {
+        'page_number': (place - 1) // settings.DRAPO_SCOREBOARD_PAGE_SIZE + 1,
+        'is_around_me': True,
+    })
+
+
+def scoreboard_json(request, contest_id):
+    contest = get_object_or_404(models.TaskBasedContest, pk=contest_id)
+    if not contest.is_visible_in_list and not request.user.is_staff:
+        return HttpResponseNotFound()
+
+    # Answer 304 Not Modified without calculating the scoreboard if client's copy is current
+    etag = scoreboards.get_scoreboard_etag(contest, request.user)
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        return response
+
+    data = {
+        'contest_id': contest.id,
+        'is_frozen': scoreboards.is_scoreboard_frozen_for_user(contest, request.user),
+    }
+    # Whole scoreboard is returned if page is not specified
+    if 'page' in request.GET:
+        page_number = _get_page_number(request)
+        rows, rows_count = scoreboards.get_scoreboard_page(contest, request.user, page_number)
+        first_place = (page_number - 1) * settings.DRAPO_SCOREBOARD_PAGE_SIZE + 1
+        data.update({
+            'page': page_number,
+            'page_size': settings.DRAPO_SCOREBOARD_PAGE_SIZE,
+            'rows_count': rows_count,
+        })
     else:
-        raise ValueError('Invalid tasks grouping mode')
+        rows = scoreboards.get_scoreboard(contest, request.user)
+        first_place = 1
+    data['rows'] = [row.to_json(place) for place, row in enumerate(rows, start=first_place)]
 
-    return render(request, 'contests/scoreboard.html', {
-        'current_contest': contest,
+    response = JsonResponse(data)
+    response['ETag'] = etag
+    return response
 
-        'contest': contest,
-        'with_categories': with_categories,
-        'tasks': tasks,
-        'categories': categories,
-        'participants': ordered_participants,
-        'scores_by_participant': scores_by_participant,
-        'max_scored_attempt_by_participant_and_task': max_scored_attempt_by_participant_and_task,
-        'first_success_attempt_by_participant_and_task': first_success_attempt_by_participant_and_task
+
+def scoreboard_progress(request, contest_id):
+    contest = get_object_or_404(models.TaskBasedContest, pk=contest_id)
+    if not contest.is_visible_in_list and not request.user.is_staff:
+        return HttpResponseNotFound()
+
+    try:
+        top_count = min(int(request.GET.get('top', settings.DRAPO_SCOREBOARD_PROGRESS_TOP)), 100)
+    except ValueError:
+        top_count = settings.DRAPO_SCOREBOARD_PROGRESS_TOP
+
+    rows = scoreboards.get_scoreboard(contest, request.user)[:top_count]
+    progress = scoreboards.get_score_progress(contest)
+
+    is_frozen = scoreboards.is_scoreboard_frozen_for_user(contest, request.user)
+    participants = []
+    for row in rows:
+        points = progress.get_points(row.participant_id)
+        if is_frozen:
+            points = [point for point in points if point[0] < contest.scoreboard_freeze_time]
+        participants.append({
+            'participant_id': row.participant_id,
+            'name': row.name,
+            'points': points,
+        })
+
+    return JsonResponse({
+        'contest_id': contest.id,
+        'is_frozen': is_frozen,
+        'participants': participants,
     })
 
 
-def get_count_attempts_in_last_minute(contest, participant):
-    minute_ago = datetime.datetime.now() - datetime.timedelta(minutes=1)
-    return tasks_models.Attempt.objects.filter(
-        contest=contest,
-        participant=participant,
-        created_at__gte=minute_ago
-    ).count()
+def scoreboard_changes(request, contest_id):
+    """
+    Polled by the scoreboard page every DRAPO_SCOREBOARD_POLL_INTERVAL seconds with the version it shows.
+    If nothing has changed, it costs one read from the cache. Otherwise returns delta to the current version
+    or asks client to reload the page. Scoreboard is never calculated for a version passed by the client:
+    old scoreboard is only read from the cache, and the new one is the current one
+    """
+    contest = get_object_or_404(models.TaskBasedContest, pk=contest_id)
+    if not contest.is_visible_in_list and not request.user.is_staff:
+        return HttpResponseNotFound()
+
+    if scoreboards.is_scoreboard_frozen_for_user(contest, request.user):
+        return JsonResponse({'event': 'frozen'})
+
+    current_version = contest.get_scoreboard_version()
+    try:
+        version = int(request.GET.get('version'))
+    except (TypeError, ValueError):
+        return JsonResponse({'event': 'reload', 'version': current_version})
+
+    if version == current_version:
+        return JsonResponse({'event': 'none', 'version': current_version})
+
+    delta = None
+    if version < current_version:
+        delta = scoreboards.get_scoreboard_delta(contest, version, current_version)
+    if delta is None:
+        return JsonResponse({'event': 'reload', 'version': current_version})
+    return JsonResponse({'event': 'delta', 'version': current_version, 'rows': delta})
+
+
+def _get_tasks_opening_policies(contest):
+    policies = list(contest.tasks_opening_policies.all())
+    # Policies use contest's cached properties (i.e. tasks), so they share the loaded contest instead of loading own one
+    for policy in policies:
+        policy.contest = contest
+    return policies
+
+
+def get_opened_tasks_ids_for_participants(contest, participants):
+    """ Returns dict: participant's id -> set of ids of opened tasks. Number of queries doesn't depend on participants """
+    opened_tasks_ids = {participant.id if participant is not None else None: set() for participant in participants}
+    # Iterate all policies, collect opened tasks
+    for policy in _get_tasks_opening_policies(contest):
+        for participant_id, tasks_ids in policy.get_open_tasks_for_participants(participants).items():
+            opened_tasks_ids[participant_id] |= tasks_ids
+    return opened_tasks_ids
+
+
+def get_opened_tasks_ids(contest, participant):
+    """ Opened tasks are cached until contest.invalidate_opened_tasks() """
+    participant_id = participant.id if participant is not None else None
+    cache_key = contest.get_opened_tasks_cache_key(participant_id)
+    opened_tasks_ids = cache.get(cache_key)
+    if opened_tasks_ids is None:
+        opened_tasks_ids = get_opened_tasks_ids_for_participants(contest, [participant])[participant_id]
+        cache.set(cache_key, opened_tasks_ids, timeout=settings.DRAPO_OPENED_TASKS_CACHE_TIMEOUT)
+    return opened_tasks_ids
 
 
 def is_task_open(contest, task, participant):
-    return any(task.id in policy.get_open_tasks(participant) for policy in contest.tasks_opening_policies.all())
+    return task.id in get_opened_tasks_ids(contest, participant)
 
 
 def task(request, contest_id, task_id):
@@ -303,7 +396,7 @@ def task(request, contest_id, task_id):
 
     participant = contest.get_participant_for_user(request.user)
 
-    if not is_task_open(contest, task, participant) and not request.user.is_staff:
+    if not request.user.is_staff and not is_task_open(contest, task, participant):
         return HttpResponseForbidden('Task is closed')
 
     if request.method == 'POST' and request.user.is_authenticated():
@@ -313,24 +406,25 @@ def task(request, contest_id, task_id):
             messages.warning(request, 'You are not registered to the contest')
         elif participant.is_disqualified:
             messages.error(request, 'You are disqualified from the contest')
-        elif get_count_attempts_in_last_minute(contest, participant) >= settings.DRAPO_MAX_TRIES_IN_MINUTE:
-            messages.error(request, 'Too fast, try later')
         elif contest.is_finished():
             messages.error(request, 'Contest is finished! You are too late, sorry')
+        # Invalid answers don't take tokens from the rate limiter
+        elif form.is_valid() and not contest.get_attempts_rate_limiter(participant).try_acquire():
+            messages.error(request, 'Too fast, try later')
         elif form.is_valid():
             answer = form.cleaned_data['answer']
             attempt = tasks_models.Attempt(
                 contest=contest,
                 task=task,
-                participant=contest.get_participant_for_user(request.user),
+                participant=participant,
                 author=request.user,
                 answer=answer
             )
-            attempt.save()
+            attempt.submit()
 
-            attempt.try_to_check()
-
-            if not attempt.is_checked:
+            if attempt.is_waiting_for_check:
+                messages.info(request, 'Your answer is being checked')
+            elif not attempt.is_checked:
                 messages.info(request, 'We will check you answer, thank you')
             elif attempt.is_correct:
                 messages.success(request, 'Yeah! Correct answer!')
@@ -360,6 +454,12 @@ def task(request, contest_id, task_id):
                             default=None
                             )
 
+    waiting_attempts = []
+    if participant is not None:
+        waiting_attempts = list(task.attempts.filter(
+            contest=contest_id, participant=participant, is_waiting_for_check=True
+        ).order_by('id'))
+
     return render(request, 'contests/task.html', {
         'current_contest': contest,
 
@@ -370,9 +470,131 @@ def task(request, contest_id, task_id):
         'attempt_form': form,
         'participant': participant,
         'participant_score': participant_score,
+        'waiting_attempts': waiting_attempts,
     })
 
 
+@login_required
+def attempt_status(request, contest_id, attempt_id):
+    """ Lightweight endpoint for polling attempt's verdict from the task page """
+    attempt = get_object_or_404(tasks_models.Attempt, pk=attempt_id, contest_id=contest_id)
+    if not request.user.is_staff:
+        participant = attempt.contest.get_participant_for_user(request.user)
+        if participant is None or participant.id != attempt.participant_id:
+            return HttpResponseNotFound()
+
+    return JsonResponse({
+        'id': attempt.id,
+        'is_waiting_for_check': attempt.is_waiting_for_check,
+        'is_checked': attempt.is_checked,
+        'is_correct': attempt.is_correct,
+        'score': attempt.score if attempt.is_checked else None,
+        'public_comment': attempt.public_comment,
+    })
+
+
+def _get_attempt_verdict(attempt):
+    if attempt.is_waiting_for_check:
+        status = 'waiting'
+    elif not attempt.is_checked:
+        status = 'postponed'
+    else:
+        status = 'correct' if attempt.is_correct else 'wrong'
+
+    return {
+        'task': attempt.task_id,
+        'attempt': attempt.id,
+        'status': status,
+        'score': attempt.score if attempt.is_checked else None,
+        'public_comment': attempt.public_comment,
+    }
+
+
+def _get_rejected_verdict(task_id, error):
+    return {
+        'task': task_id,
+        'status': 'rejected',
+        'error': error,
+    }
+
+
+def _parse_submitted_attempt(item):
+    """ Returns pair (task_id, answer), task_id is None if it's invalid """
+    if not isinstance(item, dict):
+        return None, None
+    task_id = item.get('task')
+    if not isinstance(task_id, int) or isinstance(task_id, bool):
+        task_id = None
+    return task_id, item.get('answer')
+
+
+@csrf_exempt
+@require_POST
+def submit_attempts(request, contest_id):
+    """
+    Batch attempts submission for scripts. Authorized by users.ApiToken in the `Authorization: Token <token>` header.
+    Request is JSON {"attempts": [{"task": <task id>, "answer": <answer>}, ...]},
+    response contains verdict for each attempt in the same order.
+    Participant, tasks, opened tasks and rate limit are looked up once for the whole batch
+    """
+    user = users_models.ApiToken.get_user_by_request(request)
+    if user is None:
+        return JsonResponse({'error': 'Invalid API token'}, status=401)
+
+    contest = get_object_or_404(models.TaskBasedContest, pk=contest_id)
+    if not contest.is_visible_in_list and not user.is_staff:
+        return HttpResponseNotFound()
+
+    try:
+        items = json.loads(request.body.decode('utf-8'))['attempts']
+        if not isinstance(items, list):
+            raise ValueError('attempts should be a list')
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Invalid request, expected {"attempts": [{"task": ..., "answer": ...}]}'}, status=400)
+    if len(items) > settings.DRAPO_MAX_ATTEMPTS_IN_BATCH:
+        return JsonResponse({'error': 'Too many attempts, maximum is %d' % settings.DRAPO_MAX_ATTEMPTS_IN_BATCH}, status=400)
+
+    participant = contest.get_participant_for_user(user)
+    if participant is None:
+        return JsonResponse({'error': 'You are not registered to the contest'}, status=403)
+    if participant.is_disqualified:
+        return JsonResponse({'error': 'You are disqualified from the contest'}, status=403)
+    if not contest.is_running():
+        return JsonResponse({'error': 'Contest is not running'}, status=403)
+
+    items = [_parse_submitted_attempt(item) for item in items]
+    requested_tasks_ids = {task_id for task_id, _ in items if task_id is not None}
+    tasks = tasks_models.Task.objects.in_bulk(requested_tasks_ids & contest.get_tasks_ids())
+    opened_tasks_ids = get_opened_tasks_ids(contest, participant)
+    rate_limiter = contest.get_attempts_rate_limiter(participant)
+
+    verdicts = []
+    with transaction.atomic():
+        for task_id, answer in items:
+            form = tasks_forms.AttemptForm(data={'answer': answer})
+            task = tasks.get(task_id)
+            if task is None:
+                verdicts.append(_get_rejected_verdict(task_id, 'No such task in the contest'))
+            elif task.id not in opened_tasks_ids and not user.is_staff:
+                verdicts.append(_get_rejected_verdict(task_id, 'Task is closed'))
+            elif not form.is_valid():
+                verdicts.append(_get_rejected_verdict(task_id, 'Invalid answer'))
+            elif not rate_limiter.try_acquire():
+                verdicts.append(_get_rejected_verdict(task_id, 'Too fast, try later'))
+            else:
+                attempt = tasks_models.Attempt(
+                    contest=contest,
+                    task=task,
+                    participant=participant,
+                    author=user,
+                    answer=form.cleaned_data['answer']
+                )
+                attempt.submit()
+                verdicts.append(_get_attempt_verdict(attempt))
+
+    return JsonResponse({'attempts': verdicts})
+
+
 @staff_required
 def add_category(request, contest_id):
     contest = get_object_or_404(models.TaskBasedContest, pk=contest_id)
@@ -446,6 +668,7 @@ def delete_category(request, contest_id, category_id):
 
     contest.categories_list.categories.remove(category)
     contest.categories_list.save()
+    contest.invalidate_opened_tasks()
 
     return redirect(urlresolvers.reverse('contests:tasks', args=[contest.id]))
 
@@ -501,6 +724,12 @@ def attempt(request, contest_id, attempt_id):
             )
             new_attempt.id = attempt.id
             new_attempt.save()
+            # Both old and new answers could be remembered with old verdicts
+            attempt.forget_verdict()
+            new_attempt.forget_verdict()
+
+            tasks_models.ParticipantTaskResult.update(contest.id, attempt.participant_id, attempt.task_id)
+            contest.invalidate_scoreboard()
 
             messages.success(request, 'Saved!')
             return redirect(urlresolvers.reverse('contests:attempts', args=[contest.id]))
@@ -516,6 +745,43 @@ def attempt(request, contest_id, attempt_id):
     })
 
 
+@staff_required
+def judge(request, contest_id):
+    """ Gives the next attempt waiting for manual check to the current staff member """
+    contest = get_object_or_404(models.TaskBasedContest, pk=contest_id)
+
+    attempt = tasks_models.Attempt.claim_for_judge(contest, request.user)
+    pending_count = contest.attempts.filter(is_checked=False, is_waiting_for_check=False).count()
+
+    return render(request, 'contests/judge.html', {
+        'current_contest': contest,
+
+        'contest': contest,
+        'attempt': attempt,
+        'pending_count': pending_count,
+    })
+
+
+@staff_required
+@require_POST
+def judge_attempt(request, contest_id, attempt_id):
+    contest = get_object_or_404(models.TaskBasedContest, pk=contest_id)
+    attempt = get_object_or_404(tasks_models.Attempt, pk=attempt_id, contest_id=contest.id)
+
+    verdict = request.POST.get('verdict')
+    if verdict not in ('accept', 'reject'):
+        return HttpResponseBadRequest('Unknown verdict')
+
+    if attempt.save_judge_verdict(request.user, verdict == 'accept', request.POST.get('public_comment', '')):
+        messages.success(request, 'Attempt by %s is %s' % (
+            attempt.participant.name, 'accepted' if attempt.is_correct else 'rejected'
+        ))
+    else:
+        messages.warning(request, 'Attempt has been checked already by another judge')
+
+    return redirect(urlresolvers.reverse('contests:judge', args=[contest.id]))
+
+
 @staff_required
 def create(request):
     if request.method == 'POST':
@@ -669,6 +935,7 @@ def add_task_to_contest(contest, category, task):
     else:
         contest.tasks_list.tasks.add(task)
         contest.tasks_list.save()
+    contest.invalidate_opened_tasks()
 
 
 def add_task_to_contest_view(request, contest, category=None):
@@ -855,6 +1122,8 @@ def delete_task(request, contest_id, task_id):
         return HttpResponseNotFound()
 
     task.delete()
+    contest.invalidate_opened_tasks()
+    contest.invalidate_scoreboard()
 
     return redirect(urlresolvers.reverse('contests:tasks', args=[contest.id]))
 
@@ -946,8 +1215,9 @@ def task_opens(request, contest_id, task_id):
         return HttpResponseNotFound()
 
     participants = sorted(contest.participants.all(), key=operator.attrgetter('name'))
+    opened_tasks_ids = get_opened_tasks_ids_for_participants(contest, participants)
     for participant in participants:
-        participant.is_task_open = is_task_open(contest, task, participant)
+        participant.is_task_open = task.id in opened_tasks_ids[participant.id]
 
     is_manual_task_opening_available = is_manual_task_opening_available_in_contest(contest)
 
@@ -984,7 +1254,9 @@ def open_task(request, contest_id, task_id, participant_id):
     )
     # Toggle opens state: close if it's open, open otherwise
     if qs.exists():
-        qs.delete()
+        # Not qs.delete(): ManualOpenedTask.delete() invalidates participant's opened tasks
+        for opened_task in qs:
+            opened_task.delete()
         if is_task_open(contest, task, participant):
             messages.warning(request, 'Task is opened for this participant not manually, you can\'t close it')
         else:
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class DrapoConfig(AppConfig):
+    name = 'drapo'
+
+    def ready(self):
+        # Registers system checks
+        from . import checks
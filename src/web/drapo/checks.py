@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.core import checks
+
+import drapo.ratelimit
+
+# These backends keep a separate cache in each process
+PER_PROCESS_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# These backends implement incr() as get and set, or keep the cache in the database
+NON_ATOMIC_CACHE_BACKENDS = PER_PROCESS_CACHE_BACKENDS + (
+    'django.core.cache.backends.db.DatabaseCache',
+    'django.core.cache.backends.filebased.FileBasedCache',
+)
+
+
+@checks.register(checks.Tags.caches)
+def check_cache_is_shared(app_configs, **kwargs):
+    """
+    Scoreboard versions, opened tasks and remembered verdicts are stored in the cache
+    and must be seen by all web and check workers. Per-process cache is allowed for development only
+    """
+    if settings.DEBUG:
+        return []
+
+    errors = []
+    for alias, config in settings.CACHES.items():
+        if config.get('BACKEND') in PER_PROCESS_CACHE_BACKENDS:
+            errors.append(checks.Error(
+                'Cache "%s" uses %s, which is not shared between processes' % (alias, config['BACKEND']),
+                hint='Use memcached or database cache (see CACHES in drapo/settings.py)',
+                id='drapo.E001',
+            ))
+    return errors
+
+
+@checks.register(checks.Tags.caches)
+def check_rate_limit_cache(app_configs, **kwargs):
+    """
+    Rate limits are checked on each request before any other work and must take tokens atomically,
+    so their cache must be memcached. Any cache is allowed for development
+    """
+    if settings.DEBUG:
+        return []
+
+    alias = drapo.ratelimit.CACHE_ALIAS
+    if alias not in settings.CACHES:
+        return [checks.Error(
+            'Cache "%s" for rate limits is not configured' % alias,
+            hint='Add memcached as "%s" to CACHES (see drapo/settings.py)' % alias,
+            id='drapo.E002',
+        )]
+
+    backend = settings.CACHES[alias].get('BACKEND')
+    if backend in NON_ATOMIC_CACHE_BACKENDS:
+        return [checks.Error(
+            'Cache "%s" for rate limits uses %s, which has no atomic incr() or queries the database' % (alias, backend),
+            hint='Use memcached (see CACHES in drapo/settings.py)',
+            id='drapo.E003',
+        )]
+    return []
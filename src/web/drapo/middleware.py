@@ -1,5 +1,11 @@
+import re
+
+from django.conf import settings
+from django.http import HttpResponse
 from django.utils import translation
 
+import drapo.ratelimit
+
 
 class LocaleMiddleware(object):
     """
@@ -18,3 +24,53 @@ class LocaleMiddleware(object):
     def process_response(self, request, response):
         translation.deactivate()
         return response
+
+
+def get_client_ip(request):
+    """
+    Returns client's address which can't be spoofed. Without proxies it's REMOTE_ADDR. Behind
+    DRAPO_TRUSTED_PROXY_COUNT proxies it's the address appended to X-Forwarded-For by the outermost of them:
+    addresses to the left of it are sent by the client and are not trusted
+    """
+    remote_addr = request.META.get('REMOTE_ADDR') or None
+    proxy_count = settings.DRAPO_TRUSTED_PROXY_COUNT
+    if proxy_count == 0:
+        return remote_addr
+
+    forwarded_for = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+    if len(forwarded_for) < proxy_count:
+        # Request hasn't passed through all proxies
+        return remote_addr
+    return forwarded_for[-proxy_count]
+
+
+class IpRateLimitMiddleware(object):
+    """
+    Limits requests from one IP address to each route class from DRAPO_IP_RATE_LIMITS.
+    Should be the first middleware: flood requests are rejected before session, user and view queries
+    """
+    def __init__(self):
+        self.route_classes = [
+            (route_class, re.compile(path_pattern), limit, window)
+            for route_class, path_pattern, limit, window in settings.DRAPO_IP_RATE_LIMITS
+        ]
+
+    def process_request(self, request):
+        for route_class, path_regex, limit, window in self.route_classes:
+            if not path_regex.match(request.path_info):
+                continue
+
+            ip = get_client_ip(request)
+            if ip is None:
+                return None
+
+            counter = drapo.ratelimit.SlidingWindowCounter(
+                'drapo:ip_rate_limit:%s:%s' % (route_class, ip), limit, window
+            )
+            retry_after = counter.hit()
+            if retry_after is not None:
+                response = HttpResponse('Too many requests, try later', status=429, content_type='text/plain')
+                response['Retry-After'] = str(retry_after)
+                return response
+            return None
+        return None
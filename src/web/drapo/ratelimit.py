@@ -0,0 +1,101 @@
+import time
+
+from django.core.cache import caches
+
+# Alias in settings.CACHES. Rate limits are checked on each request before any other work,
+# so their cache must not be the database and must have atomic incr (memcached)
+CACHE_ALIAS = 'ratelimit'
+
+
+class TokenBucket:
+    """
+    Token bucket with `capacity` tokens refilled in `period` seconds, stored in the rate limit cache.
+    Implemented as GCRA (generic cell rate algorithm): the cache keeps only the theoretical arrival time
+    of the next request in milliseconds, and it's changed by atomic incr/decr only,
+    so concurrent requests from several web workers can't take more tokens than allowed.
+    State lives in a key per period, which expires after the next period. incr() doesn't prolong the key,
+    so the first request of the period continues from the previous period's key instead.
+    If the cache is unavailable, requests are not limited
+    """
+    def __init__(self, key, capacity, period):
+        self.key = key
+        self.period_ms = int(period * 1000)
+        # Each request moves theoretical arrival time by the interval between tokens
+        self.interval_ms = max(self.period_ms // capacity, 1)
+        # Key is used during its period and read during the next one
+        self.timeout = 2 * self.period_ms // 1000 + 1
+        self.cache = caches[CACHE_ALIAS]
+
+    def _get_key(self, time_ms):
+        return '%s:%d' % (self.key, time_ms // self.period_ms)
+
+    def _increment(self, now, delta):
+        key = self._get_key(now)
+        try:
+            return key, self.cache.incr(key, delta)
+        except ValueError:
+            pass
+        # First request in this period. If there is no previous key, bucket has been idle for a period, so it's full
+        previous_arrival_time = self.cache.get(self._get_key(now - self.period_ms))
+        self.cache.add(key, previous_arrival_time or now, timeout=self.timeout)
+        try:
+            return key, self.cache.incr(key, delta)
+        except ValueError:
+            # Cache is unavailable
+            return None, now + delta
+
+    @staticmethod
+    def _now_ms():
+        return int(time.time() * 1000)
+
+    def try_acquire(self):
+        """ Takes one token from the bucket. Returns False if bucket is empty, rejected requests don't take tokens """
+        now = self._now_ms()
+        key, arrival_time = self._increment(now, self.interval_ms)
+
+        if arrival_time - now > self.period_ms:
+            self.cache.decr(key, self.interval_ms)
+            return False
+
+        if key is not None and arrival_time < now + self.interval_ms:
+            # Bucket was idle and its arrival time is in the past: bucket is full, but not more than full
+            self.cache.incr(key, now + self.interval_ms - arrival_time)
+        return True
+
+    def reset(self):
+        now = self._now_ms()
+        self.cache.delete_many([self._get_key(now), self._get_key(now - self.period_ms)])
+
+
+class SlidingWindowCounter:
+    """
+    Approximate sliding window: counters for the current and previous fixed windows are kept in the cache,
+    previous one is weighted by the part of it which is still inside the sliding window.
+    Counters are kept in the rate limit cache, if it's unavailable, requests are not limited
+    """
+    def __init__(self, key, limit, window):
+        self.key = key
+        self.limit = limit
+        self.window = window
+        self.cache = caches[CACHE_ALIAS]
+
+    def hit(self):
+        """ Counts the request. Returns None if it's allowed or number of seconds to wait otherwise """
+        now = time.time()
+        window_index = int(now // self.window)
+        current_key = '%s:%d' % (self.key, window_index)
+        previous_key = '%s:%d' % (self.key, window_index - 1)
+
+        # Counters live two windows: the current one and the next one, where they become previous
+        self.cache.add(current_key, 0, timeout=self.window * 2)
+        try:
+            current_count = self.cache.incr(current_key)
+        except ValueError:
+            # Counter has been evicted right after adding
+            current_count = 1
+        previous_count = self.cache.get(previous_key, 0)
+
+        elapsed_part = now / self.window - window_index
+        if previous_count * (1 - elapsed_part) + current_count <= self.limit:
+            return None
+        return int(self.window * (1 - elapsed_part)) + 1
@@ -54,6 +54,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE_CLASSES = [
+    'drapo.middleware.IpRateLimitMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -99,6 +100,33 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/1.9/topics/cache/
+# Scoreboards, opened tasks and remembered verdicts rely on the cache shared by all web and check workers,
+# so per-process backends (LocMemCache) are refused by the system check unless DEBUG is on.
+# Database cache works out of the box after `./manage.py createcachetable`,
+# memcached (django.core.cache.backends.memcached.MemcachedCache) is faster for big contests.
+# Rate limits are checked before any other work on each request, so they are kept in memcached only:
+# its incr() is atomic and it doesn't touch the database. If memcached is down, requests are not limited
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'drapo_cache',
+        # Database cache's incr() resets timeout of the key to this one, so cache versions must not expire earlier
+        'TIMEOUT': 24 * 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+    'ratelimit': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': '127.0.0.1:11211',
+        'KEY_PREFIX': 'drapo_ratelimit',
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/1.9/ref/settings/#auth-password-validators
 
@@ -164,9 +192,69 @@ DRAPO_TEAM_SIZE_LIMIT = 100
 # By one participant in one contest
 DRAPO_MAX_TRIES_IN_MINUTE = 10
 
+# Maximum number of attempts in one request to the batch submission API
+DRAPO_MAX_ATTEMPTS_IN_BATCH = 100
+
+# In seconds. Verdict of the checked answer is reused if the participant sends the same answer again
+DRAPO_CHECKED_ANSWERS_MEMO_TIMEOUT = 60 * 60
+# If False, repeated answers are not saved as new attempts, they are only counted in ParticipantTaskResult
+DRAPO_STORE_DUPLICATE_ATTEMPTS = True
+
+# Requests from one IP address, checked by drapo.middleware.IpRateLimitMiddleware.
+# Route class, regular expression for path, maximum number of requests in the sliding window, window in seconds.
+# Only the first matched route class is applied
+DRAPO_IP_RATE_LIMITS = [
+    ('login', r'^/users/(login|register)/$', 30, 60),
+    ('task', r'^/contests/\d+/tasks/\d+/$', 120, 60),
+    ('attempt_status', r'^/contests/\d+/attempts/\d+/status/$', 120, 60),
+    ('submit_attempts', r'^/contests/\d+/attempts/submit/$', 60, 60),
+]
+
+# Number of reverse proxies which append client's address to X-Forwarded-For.
+# 0 if REMOTE_ADDR is the client's address, i.e. nginx passes it by `include uwsgi_params` (see etc/nginx.example.conf)
+DRAPO_TRUSTED_PROXY_COUNT = 0
+
 DRAPO_EMAIL_SENDER = 'admin@summer-ctf.com'
 DRAPO_UPLOAD_DIR = os.path.join(BASE_DIR, '..', '..', 'upload')
 DRAPO_TASKS_FILES_DIR = os.path.join(DRAPO_UPLOAD_DIR, 'tasks_files')
+# Programs of ExternalProgramCheckers are looked for in this directory only
+DRAPO_EXTERNAL_CHECKERS_DIR = os.path.join(BASE_DIR, '..', '..', 'checkers')
+# In bytes, the rest of checker's stdout and stderr is ignored
+DRAPO_EXTERNAL_CHECKER_MAX_OUTPUT = 10000
+
+# In seconds. Scoreboard is recalculated after any change in the contest anyway
+DRAPO_SCOREBOARD_CACHE_TIMEOUT = 60 * 60
+# In seconds. Opened tasks are recalculated after solving tasks, opening them manually or editing tasks anyway
+DRAPO_OPENED_TASKS_CACHE_TIMEOUT = 60 * 60
+
+# In seconds, how often the open scoreboard page asks for changes. Request is short and doesn't hold a web worker
+DRAPO_SCOREBOARD_POLL_INTERVAL = 5
+
+# Scoreboard calculation from attempts (i.e. for frozen scoreboard) is vectorized
+# if numpy is installed and contest has at least so many attempts
+DRAPO_SCOREBOARD_NUMPY_MIN_ATTEMPTS = 100000
+
+# How many participants are shown on the score progress graph by default
+DRAPO_SCOREBOARD_PROGRESS_TOP = 10
+
+# Attempts for slow checkers are checked by `manage.py check_attempts` workers.
+# If worker doesn't finish the check in so many seconds, attempt is given to another worker.
+# Attempts are leased one by one, so it should be greater than the maximum timeout of ExternalProgramCheckers
+DRAPO_CHECK_LEASE_DURATION = 60
+DRAPO_CHECK_WORKERS = 4
+# In seconds, how often idle worker looks for new attempts
+DRAPO_CHECK_POLL_INTERVAL = 1
+# In seconds. If judge doesn't check the attempt in this time, it's given to another judge
+DRAPO_JUDGE_LEASE_DURATION = 10 * 60
+
+# How many compiled patterns of RegExpCheckers are kept by each process
+DRAPO_COMPILED_REGEXPS_CACHE_SIZE = 1000
+# In seconds. Slower matches are considered as wrong answers
+DRAPO_REGEXP_MATCH_TIMEOUT = 1
+
+DRAPO_SCOREBOARD_PAGE_SIZE = 50
+# How many rows above and below the participant are shown in the "My position" view
+DRAPO_SCOREBOARD_AROUND_ME_ROWS = 10
 
 DRAPO_TEAM_NAMES_ARE_UNIQUE = False
 DRAPO_USER_CAN_BE_ONLY_IN_ONE_TEAM = False
@@ -0,0 +1,39 @@
+/* Polls verdicts of attempts which are being checked by check workers.
+ * See contests.views.attempt_status for details
+ * */
+
+$(document).ready(function() {
+    var poll_interval = 2000;
+
+    var show_verdict = function ($status, attempt) {
+        var text;
+        $status.removeClass('alert-info');
+        if (! attempt.is_checked)
+            text = 'We will check you answer, thank you';
+        else if (attempt.is_correct) {
+            $status.addClass('alert-success');
+            text = 'Yeah! Correct answer!';
+        } else {
+            $status.addClass('alert-danger');
+            text = 'Wrong answer, sorry';
+        }
+        $status.text(text);
+        if (attempt.public_comment)
+            $status.append($('<div></div>').text(attempt.public_comment));
+    };
+
+    $('.attempt-status[data-status-url]').each(function () {
+        var $status = $(this);
+        var poll = function () {
+            $.getJSON($status.data('status-url'), function (attempt) {
+                if (attempt.is_waiting_for_check)
+                    setTimeout(poll, poll_interval);
+                else
+                    show_verdict($status, attempt);
+            }).fail(function () {
+                setTimeout(poll, poll_interval);
+            });
+        };
+        setTimeout(poll, poll_interval);
+    });
+});
@@ -0,0 +1,25 @@
+/* Keyboard shortcuts for the judging page: A accepts the attempt, R rejects it.
+ * See contests.views.judge for details
+ * */
+
+$(document).ready(function() {
+    var $form = $('.judge-form');
+    if ($form.length === 0)
+        return;
+
+    var shortcuts = {
+        'a': 'accept',
+        'r': 'reject'
+    };
+
+    $(document).keydown(function (e) {
+        if ($(e.target).is('input, textarea') || e.ctrlKey || e.altKey || e.metaKey)
+            return;
+        var verdict = shortcuts[e.key && e.key.toLowerCase()];
+        if (verdict === undefined)
+            return;
+
+        e.preventDefault();
+        $form.find('button[name="verdict"][value="' + verdict + '"]').click();
+    });
+});
@@ -0,0 +1,83 @@
+/* Polls scoreboard changes and patches the scoreboard table in place.
+ * See contests.views.scoreboard_changes for details
+ * */
+
+$(document).ready(function() {
+    var $scoreboard = $('.scoreboard[data-changes-url]');
+    if ($scoreboard.length === 0)
+        return;
+
+    var $tbody = $scoreboard.find('tbody');
+    /* Table shows only a part of the scoreboard: one page or rows around the participant */
+    var first_place = $scoreboard.data('first-place');
+    var last_place = $scoreboard.data('last-place');
+    $tbody.children('tr').each(function (index) {
+        $(this).data('place', first_place + index);
+    });
+
+    var apply_row = function (row) {
+        var $row = $tbody.find('tr[data-participant-id="' + row.participant_id + '"]');
+        var is_on_page = first_place <= row.place && row.place <= last_place;
+        if ($row.length === 0)
+            /* Changes outside of the shown part are ignored, but a new participant on the page needs reload */
+            return ! is_on_page;
+        if (! is_on_page)
+            return false;
+
+        if ($row.find('.scoreboard__disqualified').length > 0 !== row.is_disqualified)
+            return false;
+
+        $row.find('.scoreboard__place').text(row.place);
+        $row.find('.scoreboard__score').text(row.score);
+        $row.data('place', row.place);
+
+        for (var task_id in row.tasks)
+            if (row.tasks.hasOwnProperty(task_id)) {
+                var score = row.tasks[task_id].score;
+                var additional_score = row.tasks[task_id].additional_score;
+                var $small = $('<small></small>').text(score === null ? '' : score);
+                if (additional_score)
+                    $small.append(' ', $('<span class="text-success"></span>').text('+' + additional_score));
+                $row.find('td[data-task-id="' + task_id + '"]').empty().append($small);
+            }
+
+        return true;
+    };
+
+    var sort_rows = function () {
+        var $rows = $tbody.children('tr');
+        $rows.sort(function (first, second) {
+            return $(first).data('place') - $(second).data('place');
+        });
+        $tbody.append($rows);
+    };
+
+    var changes_url = $scoreboard.data('changes-url');
+    var poll_interval = $scoreboard.data('poll-interval');
+    var version = $scoreboard.data('version');
+
+    var apply_delta = function (rows) {
+        for (var i = 0; i < rows.length; i++)
+            if (! apply_row(rows[i]))
+                /* Rows have moved in or out of the shown part, we can't patch the table */
+                return false;
+        sort_rows();
+        return true;
+    };
+
+    var poll = function () {
+        $.getJSON(changes_url, {version: version}, function (changes) {
+            if (changes.event === 'none')
+                setTimeout(poll, poll_interval);
+            else if (changes.event === 'delta' && apply_delta(changes.rows)) {
+                version = changes.version;
+                setTimeout(poll, poll_interval);
+            } else
+                /* Scoreboard is frozen or delta can't be calculated */
+                window.location.reload(true);
+        }).fail(function () {
+            setTimeout(poll, poll_interval);
+        });
+    };
+    setTimeout(poll, poll_interval);
+});
@@ -3,8 +3,23 @@ from django.contrib import admin
 from . import models
 
 
+def rejudge_tasks(modeladmin, request, queryset):
+    summary = models.Attempt.rejudge(models.Attempt.objects.filter(task__in=queryset), enqueue_slow_checks=True)
+    modeladmin.message_user(request, str(summary))
+
+rejudge_tasks.short_description = 'Rejudge attempts of selected tasks'
+
+
+def rejudge_attempts(modeladmin, request, queryset):
+    summary = models.Attempt.rejudge(queryset, enqueue_slow_checks=True)
+    modeladmin.message_user(request, str(summary))
+
+rejudge_attempts.short_description = 'Rejudge selected attempts'
+
+
 class TaskAdmin(admin.ModelAdmin):
     list_display = ('id', 'statement_generator', 'max_score', 'checker')
+    actions = [rejudge_tasks]
 
 admin.site.register(models.Task, TaskAdmin)
 
@@ -25,6 +40,28 @@ class RegExpCheckerAdmin(admin.ModelAdmin):
 admin.site.register(models.RegExpChecker, RegExpCheckerAdmin)
 
 
+class ParticipantFlagCheckerAdmin(admin.ModelAdmin):
+    list_display = ('id', 'task', 'prefix')
+    list_display_links = ('id', 'task')
+
+admin.site.register(models.ParticipantFlagChecker, ParticipantFlagCheckerAdmin)
+
+
+class ParticipantFlagAdmin(admin.ModelAdmin):
+    list_display = ('id', 'checker', 'participant', 'flag')
+    list_filter = ('checker', )
+    search_fields = ('flag', )
+
+admin.site.register(models.ParticipantFlag, ParticipantFlagAdmin)
+
+
+class ExternalProgramCheckerAdmin(admin.ModelAdmin):
+    list_display = ('id', 'task', 'program', 'timeout', 'memory_limit')
+    list_display_links = ('id', 'task')
+
+admin.site.register(models.ExternalProgramChecker, ExternalProgramCheckerAdmin)
+
+
 class TextStatementGeneratorAdmin(admin.ModelAdmin):
     list_display = ('id', 'task', 'template', 'last_change_time')
 
@@ -39,9 +76,24 @@ admin.site.register(models.ContestTasks, ContestTasksAdmin)
 
 
 class AttemptAdmin(admin.ModelAdmin):
+    # Verdicts are not editable in the list: changes must go through save_model() to update the results
     list_display = ('id', 'contest', 'task', 'is_checked', 'is_correct')
-    list_editable = ('is_checked', 'is_correct')
-    list_filter = ('contest', 'task')
+    list_filter = ('contest', 'task', 'is_waiting_for_check')
+    actions = [rejudge_attempts]
+
+    @staticmethod
+    def _update_result(attempt):
+        attempt.forget_verdict()
+        models.ParticipantTaskResult.update(attempt.contest_id, attempt.participant_id, attempt.task_id)
+        attempt.contest.invalidate_scoreboard()
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        self._update_result(obj)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self._update_result(obj)
 
 admin.site.register(models.Attempt, AttemptAdmin)
 
@@ -71,3 +123,17 @@ class ManualOpenedTaskAdmin(admin.ModelAdmin):
     list_filter = ('contest', 'task')
 
 admin.site.register(models.ManualOpenedTask, ManualOpenedTaskAdmin)
+
+
+class ParticipantTaskResultAdmin(admin.ModelAdmin):
+    list_display = ('id', 'contest', 'participant', 'task', 'best_score', 'tries_count', 'first_success_time')
+    list_filter = ('contest', 'task')
+
+admin.site.register(models.ParticipantTaskResult, ParticipantTaskResultAdmin)
+
+
+class ContestSolvedTaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'contest', 'task')
+    list_filter = ('contest', )
+
+admin.site.register(models.ContestSolvedTask, ContestSolvedTaskAdmin)
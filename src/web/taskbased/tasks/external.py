@@ -0,0 +1,66 @@
+import os
+import os.path
+import resource
+import signal
+import subprocess
+
+from django.conf import settings
+
+
+class ProgramResult:
+    def __init__(self, exit_code, stdout, stderr, is_timed_out=False):
+        self.exit_code = exit_code
+        self.stdout = stdout
+        self.stderr = stderr
+        self.is_timed_out = is_timed_out
+
+
+def get_program_path(program):
+    """ Returns absolute path of the program. Programs outside settings.DRAPO_EXTERNAL_CHECKERS_DIR are not allowed """
+    checkers_dir = os.path.realpath(settings.DRAPO_EXTERNAL_CHECKERS_DIR)
+    path = os.path.realpath(os.path.join(checkers_dir, program))
+    if os.path.commonpath([checkers_dir, path]) != checkers_dir:
+        raise ValueError('Program %s is outside of %s' % (program, checkers_dir))
+    return path
+
+
+def _limit_resources(timeout, memory_limit):
+    """ Runs in the child process before exec """
+    memory_limit_bytes = memory_limit * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, memory_limit_bytes))
+    # Wall clock timeout is checked by the parent, CPU limit is the second line of defence
+    resource.setrlimit(resource.RLIMIT_CPU, (timeout + 1, timeout + 1))
+
+
+def _truncate(output):
+    return output[:settings.DRAPO_EXTERNAL_CHECKER_MAX_OUTPUT].decode('utf-8', errors='replace')
+
+
+def run_program(program, arguments, input, timeout, memory_limit, env=None):
+    """
+    Runs the program with limited time (in seconds) and address space (in megabytes), passes `input` to its stdin.
+    Program is started in its own session, so on timeout all processes started by it are killed too.
+    It's called by check workers only (see `manage.py check_attempts`), web workers never start programs
+    """
+    process = subprocess.Popen(
+        [get_program_path(program)] + list(arguments),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=os.path.realpath(settings.DRAPO_EXTERNAL_CHECKERS_DIR),
+        env=env,
+        start_new_session=True,
+        preexec_fn=lambda: _limit_resources(timeout, memory_limit),
+    )
+    try:
+        stdout, stderr = process.communicate(input.encode('utf-8'), timeout=timeout)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            # Program has finished right after the timeout
+            pass
+        stdout, stderr = process.communicate()
+        return ProgramResult(process.returncode, _truncate(stdout), _truncate(stderr), is_timed_out=True)
+
+    return ProgramResult(process.returncode, _truncate(stdout), _truncate(stderr))
@@ -0,0 +1,70 @@
+import logging
+import multiprocessing
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from taskbased.tasks import models
+
+
+logger = logging.getLogger(__name__)
+
+
+def check_waiting_attempts(limit):
+    """
+    Checks up to `limit` attempts waiting for check. Each attempt is leased right before its check,
+    so the lease doesn't expire while previous attempts are checked. Returns number of checked attempts
+    """
+    checked_count = 0
+    while checked_count < limit:
+        attempt = models.Attempt.claim_for_check()
+        if attempt is None:
+            break
+        try:
+            if not attempt.check_by_worker():
+                logger.warning('Lease of attempt %d has expired, verdict is not saved', attempt.id)
+        except Exception:
+            # Attempt stays waiting for check and will be taken again after the lease expires
+            logger.exception('Can\'t check attempt %d', attempt.id)
+        checked_count += 1
+    return checked_count
+
+
+def run_worker(batch_size, poll_interval, run_once):
+    while True:
+        checked_count = check_waiting_attempts(batch_size)
+        if run_once:
+            return
+        if checked_count == 0:
+            time.sleep(poll_interval)
+
+
+class Command(BaseCommand):
+    help = 'Runs pool of workers which check attempts for tasks with slow checkers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.DRAPO_CHECK_WORKERS)
+        parser.add_argument(
+            '--batch-size', type=int, default=10, help='Maximum number of attempts checked in one pass, with --once command exits after it'
+        )
+        parser.add_argument('--poll-interval', type=float, default=settings.DRAPO_CHECK_POLL_INTERVAL)
+        parser.add_argument('--once', action='store_true', help='Check waiting attempts once and exit')
+
+    def handle(self, *args, **options):
+        worker_args = (options['batch_size'], options['poll_interval'], options['once'])
+        if options['workers'] <= 1:
+            run_worker(*worker_args)
+            return
+
+        # Child processes must not share parent's database connections
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(target=run_worker, args=worker_args, daemon=True)
+            for _ in range(options['workers'])
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
@@ -0,0 +1,37 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+import contests.models
+from taskbased.tasks import models
+
+
+class Command(BaseCommand):
+    help = 'Generates own flags for all participants of contests with the task and prints them as CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('task', type=int, help='Task id')
+
+    def handle(self, *args, **options):
+        task = models.Task.objects.filter(id=options['task']).first()
+        if task is None:
+            raise CommandError('Task %d not found' % options['task'])
+        checker = task.checker
+        if not isinstance(checker, models.ParticipantFlagChecker):
+            raise CommandError('Task %d has no ParticipantFlagChecker' % task.id)
+
+        participants = [
+            participant
+            for contest in contests.models.TaskBasedContest.objects.all()
+            if contest.has_task(task)
+            for participant in contest.participants.all()
+        ]
+        generated_count = checker.generate_flags(participants)
+        self.stderr.write('Generated %d flags' % generated_count)
+
+        writer = csv.writer(self.stdout)
+        writer.writerow(['participant_id', 'participant', 'flag'])
+        participants_by_id = {participant.id: participant for participant in participants}
+        for participant_id, flag in checker.flags.order_by('participant_id').values_list('participant_id', 'flag'):
+            if participant_id in participants_by_id:
+                writer.writerow([participant_id, participants_by_id[participant_id].name, flag])
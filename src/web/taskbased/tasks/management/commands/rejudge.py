@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from taskbased.tasks import models
+
+
+class Command(BaseCommand):
+    help = 'Checks attempts of the task or of the whole contest again, i.e. after fixing the checker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--contest', type=int, help='Contest id')
+        parser.add_argument('--task', type=int, help='Task id')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['contest'] is None and options['task'] is None:
+            raise CommandError('Specify --contest or --task')
+
+        attempts = models.Attempt.objects.all()
+        if options['contest'] is not None:
+            attempts = attempts.filter(contest_id=options['contest'])
+        if options['task'] is not None:
+            attempts = attempts.filter(task_id=options['task'])
+
+        summary = models.Attempt.rejudge(attempts, options['chunk_size'])
+
+        self.stdout.write(str(summary))
+        for task_id, changed_count in sorted(summary.changed_by_task.items()):
+            self.stdout.write('Task %d: %d attempts changed' % (task_id, changed_count))
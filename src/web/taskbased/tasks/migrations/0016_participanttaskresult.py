@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 04:40
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_participant_task_results(apps, schema_editor):
+    Attempt = apps.get_model('tasks', 'Attempt')
+    ParticipantTaskResult = apps.get_model('tasks', 'ParticipantTaskResult')
+
+    results = {}
+    for attempt in Attempt.objects.order_by('id').iterator():
+        key = (attempt.participant_id, attempt.task_id)
+        if key not in results:
+            results[key] = ParticipantTaskResult(
+                contest_id=attempt.contest_id,
+                participant_id=attempt.participant_id,
+                task_id=attempt.task_id,
+            )
+        result = results[key]
+
+        result.tries_count += 1
+        if attempt.is_checked and (result.best_score is None or attempt.score > result.best_score):
+            result.best_score = attempt.score
+            result.best_score_time = attempt.created_at
+        if attempt.is_correct:
+            if result.first_success_time is None or attempt.created_at < result.first_success_time:
+                result.first_success_time = attempt.created_at
+            if result.last_success_time is None or attempt.created_at > result.last_success_time:
+                result.last_success_time = attempt.created_at
+
+    ParticipantTaskResult.objects.bulk_create(results.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contests', '0006_auto_20160718_1313'),
+        ('tasks', '0015_auto_20160729_1900'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParticipantTaskResult',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tries_count', models.PositiveIntegerField(default=0)),
+                ('best_score', models.IntegerField(default=None, help_text='Maximum score among checked attempts or None if there are no checked attempts', null=True)),
+                ('best_score_time', models.DateTimeField(default=None, help_text='Creation time of the first attempt with the best score', null=True)),
+                ('first_success_time', models.DateTimeField(default=None, null=True)),
+                ('last_success_time', models.DateTimeField(default=None, null=True)),
+                ('contest', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='contests.Contest')),
+                ('participant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='contests.AbstractParticipant')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='tasks.Task')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='participanttaskresult',
+            unique_together=set([('participant', 'task')]),
+        ),
+        migrations.RunPython(fill_participant_task_results, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 04:58
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0016_participanttaskresult'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attempt',
+            name='check_lease_until',
+            field=models.DateTimeField(default=None, help_text='Attempt is being checked by a worker. After this time other worker can take it', null=True),
+        ),
+        migrations.AddField(
+            model_name='attempt',
+            name='is_waiting_for_check',
+            field=models.BooleanField(db_index=True, default=False, help_text='Attempt will be checked by one of check workers'),
+        ),
+    ]
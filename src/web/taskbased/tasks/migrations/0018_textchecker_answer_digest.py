@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 05:02
+from __future__ import unicode_literals
+
+import hashlib
+import unicodedata
+
+from django.db import migrations, models
+
+
+def fill_answer_digests(apps, schema_editor):
+    # Copy of TextChecker.normalize_answer() and TextChecker.get_digest(): migrations can't use model's methods
+    TextChecker = apps.get_model('tasks', 'TextChecker')
+    for checker in TextChecker.objects.all():
+        if checker.case_sensitive:
+            checker.normalized_answer = checker.answer
+        else:
+            checker.normalized_answer = unicodedata.normalize('NFKD', checker.answer.casefold())
+        checker.answer_digest = hashlib.sha256(checker.normalized_answer.encode('utf-8')).hexdigest()
+        checker.save(update_fields=['normalized_answer', 'answer_digest'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0017_attempt_check_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='textchecker',
+            name='answer_digest',
+            field=models.CharField(default='', editable=False, help_text='SHA-256 of the normalized answer. Filled on save', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='textchecker',
+            name='normalized_answer',
+            field=models.TextField(default='', editable=False, help_text='Answer in the form used for comparison. Filled on save'),
+        ),
+        migrations.RunPython(fill_answer_digests, migrations.RunPython.noop),
+    ]
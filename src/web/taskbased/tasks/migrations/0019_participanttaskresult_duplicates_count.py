@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 05:06
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0018_textchecker_answer_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='participanttaskresult',
+            name='duplicates_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of repeated answers which were not saved as attempts. See settings.DRAPO_STORE_DUPLICATE_ATTEMPTS'),
+        ),
+    ]
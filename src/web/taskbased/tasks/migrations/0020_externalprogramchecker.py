@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 05:08
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0019_participanttaskresult_duplicates_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExternalProgramChecker',
+            fields=[
+                ('abstractchecker_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='tasks.AbstractChecker')),
+                ('program', models.CharField(help_text='Path to the executable relative to settings.DRAPO_EXTERNAL_CHECKERS_DIR', max_length=1000)),
+                ('arguments', models.TextField(blank=True, help_text='Command line arguments, one per line')),
+                ('timeout', models.PositiveIntegerField(default=10, help_text='In seconds')),
+                ('memory_limit', models.PositiveIntegerField(default=256, help_text='In megabytes')),
+            ],
+            options={
+                'abstract': False,
+            },
+            bases=('tasks.abstractchecker',),
+        ),
+    ]
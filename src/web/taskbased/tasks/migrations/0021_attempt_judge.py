@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 05:09
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tasks', '0020_externalprogramchecker'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attempt',
+            name='judge',
+            field=models.ForeignKey(blank=True, default=None, help_text='Staff member who checks or has checked the attempt manually', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='attempt',
+            name='judge_lease_until',
+            field=models.DateTimeField(default=None, help_text='Attempt is being checked by the judge. After this time other judge can take it', null=True),
+        ),
+    ]
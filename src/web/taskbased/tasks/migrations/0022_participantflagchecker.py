@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 05:12
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contests', '0008_taskbasedcontest_attempts_limit'),
+        ('tasks', '0021_attempt_judge'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParticipantFlag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('flag', models.CharField(max_length=200)),
+                ('flag_digest', models.CharField(help_text='Sha256 of the flag, used for lookups', max_length=64)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ParticipantFlagChecker',
+            fields=[
+                ('abstractchecker_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='tasks.AbstractChecker')),
+                ('prefix', models.CharField(blank=True, default='flag_', help_text='Prefix of generated flags', max_length=100)),
+            ],
+            options={
+                'abstract': False,
+            },
+            bases=('tasks.abstractchecker',),
+        ),
+        migrations.AddField(
+            model_name='participantflag',
+            name='checker',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='flags', to='tasks.ParticipantFlagChecker'),
+        ),
+        migrations.AddField(
+            model_name='participantflag',
+            name='participant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contests.AbstractParticipant'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='participantflag',
+            unique_together=set([('checker', 'participant'), ('checker', 'flag_digest')]),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 05:17
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_contest_solved_tasks(apps, schema_editor):
+    ParticipantTaskResult = apps.get_model('tasks', 'ParticipantTaskResult')
+    ContestSolvedTask = apps.get_model('tasks', 'ContestSolvedTask')
+    solved = ParticipantTaskResult.objects.filter(
+        first_success_time__isnull=False
+    ).values_list('contest_id', 'task_id').distinct()
+    ContestSolvedTask.objects.bulk_create(
+        [ContestSolvedTask(contest_id=contest_id, task_id=task_id) for contest_id, task_id in solved],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contests', '0008_taskbasedcontest_attempts_limit'),
+        ('tasks', '0022_participantflagchecker'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContestSolvedTask',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('contest', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contests.Contest')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tasks.Task')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='contestsolvedtask',
+            unique_together=set([('contest', 'task')]),
+        ),
+        migrations.RunPython(fill_contest_solved_tasks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 05:32
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0023_contestsolvedtask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attempt',
+            name='check_lease_token',
+            field=models.CharField(blank=True, help_text='Random token of the current lease. Worker saves the verdict only if its lease has not been taken over', max_length=20),
+        ),
+    ]
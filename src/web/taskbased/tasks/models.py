@@ -1,21 +1,37 @@
 import abc
+import collections
+import datetime
+import hashlib
+import logging
+import threading
+import time
 import unicodedata
-import re
 import os.path
+import string
 
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import F, Min, Max, Case, When, Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 import django.db.migrations.writer
 from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
+import regex
 import sortedm2m.fields
 import polymorphic.models
 from django.db.models.query_utils import Q
 from relativefilepathfield.fields import RelativeFilePathField
 
 import drapo.models
+from drapo.common import generate_random_secret_string
 import contests.models
 import users.models
+from . import external
+
+
+logger = logging.getLogger(__name__)
 
 
 class TaskStatement:
@@ -33,15 +49,18 @@ class CheckResult(abc.ABC):
     public_comment = ''
     private_comment = ''
     score = 0
+    # False if the checker has failed to give a real verdict, i.e. has been timed out
+    is_definitive = True
 
 
 class Checked(CheckResult):
-    def __init__(self, is_answer_correct, public_comment='', private_comment='', score=0):
+    def __init__(self, is_answer_correct, public_comment='', private_comment='', score=0, is_definitive=True):
         self.is_checked = True
         self.is_correct = is_answer_correct
         self.public_comment = public_comment
         self.private_comment = private_comment
         self.score = score
+        self.is_definitive = is_definitive
 
 
 class PostponeForManualCheck(CheckResult):
@@ -83,42 +102,117 @@ class TextStatementGenerator(AbstractStatementGenerator):
 
 
 class AbstractChecker(polymorphic.models.PolymorphicModel):
+    # Fast checkers check attempts inside the HTTP request,
+    # attempts for other ones are checked by workers, see `manage.py check_attempts`
+    is_fast = False
+    # Deterministic checkers always give the same verdict for the same participant and answer,
+    # so their verdicts are remembered for repeated answers, see Attempt.submit()
+    is_deterministic = False
+
     def check_attempt(self, attempt, context):
         """ Returns CheckResult or bool """
         raise NotImplementedError('Child should implement it\'s own check()')
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Remembered verdicts of the task's attempts can be wrong for the changed checker
+        for task in Task.objects.filter(checker_id=self.id):
+            task.invalidate_checked_answers()
+
     def __str__(self):
         return str(self.get_real_instance())
 
 
 class TextChecker(AbstractChecker):
+    is_fast = True
+    is_deterministic = True
+
     answer = models.TextField(help_text=_('Correct answer'))
 
     case_sensitive = models.BooleanField(help_text=_('Is answer case sensitive'), default=False)
 
+    normalized_answer = models.TextField(
+        editable=False,
+        default='',
+        help_text='Answer in the form used for comparison. Filled on save'
+    )
+
+    answer_digest = models.CharField(
+        max_length=64,
+        editable=False,
+        default='',
+        help_text='SHA-256 of the normalized answer. Filled on save'
+    )
+
     def __str__(self):
         return '== "%s"' % (self.answer, )
 
     @classmethod
     def _normalize_case_less(cls, text):
-        return unicodedata.normalize('NFKD', text.casefold())
-
-    @classmethod
-    def _case_insensitive_string_comparison(cls, first, second):
         """
         Case insensitive comparison is hard problem.
         See http://stackoverflow.com/questions/319426/how-do-i-do-a-case-insensitive-string-comparison-in-python
         for details
         """
-        return cls._normalize_case_less(first) == cls._normalize_case_less(second)
+        return unicodedata.normalize('NFKD', text.casefold())
+
+    @classmethod
+    def normalize_answer(cls, answer, case_sensitive):
+        if case_sensitive:
+            return answer
+        return cls._normalize_case_less(answer)
+
+    @staticmethod
+    def get_digest(normalized_answer):
+        return hashlib.sha256(normalized_answer.encode('utf-8')).hexdigest()
+
+    def save(self, *args, **kwargs):
+        self.normalized_answer = self.normalize_answer(self.answer, self.case_sensitive)
+        self.answer_digest = self.get_digest(self.normalized_answer)
+        super().save(*args, **kwargs)
 
     def check_attempt(self, attempt, context):
-        if self.case_sensitive:
-            return self.answer == attempt.answer
-        return self._case_insensitive_string_comparison(self.answer, attempt.answer)
+        # Only incoming answer is normalized, correct one is normalized on save
+        return self.get_digest(self.normalize_answer(attempt.answer, self.case_sensitive)) == self.answer_digest
+
+
+class CompiledRegexpsCache:
+    """
+    Process-wide LRU cache of compiled regular expressions. Key contains pattern and flags,
+    so other processes never use stale entries, and saved checker invalidates its entries in this process
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._compiled = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, checker_id, pattern, flags):
+        key = (checker_id, pattern, flags)
+        with self._lock:
+            if key in self._compiled:
+                self._compiled.move_to_end(key)
+                return self._compiled[key]
+
+        compiled = regex.compile(pattern, flags)
+        with self._lock:
+            self._compiled[key] = compiled
+            while len(self._compiled) > self.max_size:
+                self._compiled.popitem(last=False)
+        return compiled
+
+    def invalidate(self, checker_id):
+        with self._lock:
+            for key in [key for key in self._compiled if key[0] == checker_id]:
+                del self._compiled[key]
+
+
+compiled_regexps_cache = CompiledRegexpsCache(settings.DRAPO_COMPILED_REGEXPS_CACHE_SIZE)
 
 
 class RegExpChecker(AbstractChecker):
+    is_fast = True
+    is_deterministic = True
+
     pattern = models.TextField(help_text='Regular expression for matching, don\'t need ^ and $')
 
     flag_ignore_case = models.BooleanField(help_text='Python\'s re.IGNORECASE (re.I)', default=False)
@@ -139,28 +233,156 @@ class RegExpChecker(AbstractChecker):
         )
 
     @property
-    def compiled_regexp(self):
+    def flags(self):
         flags = 0
         if self.flag_ignore_case:
-            flags |= re.IGNORECASE
+            flags |= regex.IGNORECASE
         if self.flag_multiline:
-            flags |= re.MULTILINE
+            flags |= regex.MULTILINE
         if self.flag_dotall:
-            flags |= re.DOTALL
+            flags |= regex.DOTALL
         if self.flag_verbose:
-            flags |= re.VERBOSE
+            flags |= regex.VERBOSE
+        return flags
 
-        return re.compile(self.pattern, flags)
+    @property
+    def compiled_regexp(self):
+        return compiled_regexps_cache.get(self.id, self.pattern, self.flags)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        compiled_regexps_cache.invalidate(self.id)
 
     def check_attempt(self, attempt, context):
-        return self.compiled_regexp.fullmatch(attempt.answer) is not None
+        # Catastrophic backtracking can take hours, so matching is limited by time.
+        # Python's re doesn't support timeouts, regex does and it's compatible with re
+        try:
+            match = self.compiled_regexp.fullmatch(attempt.answer, timeout=settings.DRAPO_REGEXP_MATCH_TIMEOUT)
+        except TimeoutError:
+            return Checked(False, private_comment='Regular expression matching is timed out', is_definitive=False)
+        return match is not None
 
 
 class ManualChecker(AbstractChecker):
+    is_fast = True
+
     def check_attempt(self, attempt, context):
         return PostponeForManualCheck()
 
 
+class ParticipantFlagChecker(AbstractChecker):
+    """
+    Each participant has own flag, see ParticipantFlag. Flags are generated by generate_flags()
+    and should be given to participants, i.e. in personal task files
+    """
+    is_fast = True
+    is_deterministic = True
+
+    prefix = models.CharField(max_length=100, blank=True, default='flag_', help_text='Prefix of generated flags')
+
+    def __str__(self):
+        return 'Flag for each participant'
+
+    def generate_flags(self, participants):
+        """ Generates flags for participants who don't have them yet. Returns number of generated flags """
+        with transaction.atomic():
+            participants_ids = {participant.id for participant in participants}
+            participants_ids -= set(self.flags.filter(participant_id__in=participants_ids).values_list('participant_id', flat=True))
+
+            flags = []
+            for participant_id in participants_ids:
+                flag = self.prefix + generate_random_secret_string(32, string.ascii_lowercase + string.digits)
+                flags.append(ParticipantFlag(
+                    checker=self,
+                    participant_id=participant_id,
+                    flag=flag,
+                    flag_digest=TextChecker.get_digest(flag)
+                ))
+            ParticipantFlag.objects.bulk_create(flags, batch_size=1000)
+        return len(flags)
+
+    def check_attempt(self, attempt, context):
+        # One lookup by the unique index on (checker, flag_digest) finds owner of the flag
+        owner_id = self.flags.filter(
+            flag_digest=TextChecker.get_digest(attempt.answer.strip())
+        ).values_list('participant_id', flat=True).first()
+
+        if owner_id is None:
+            return False
+        if owner_id == attempt.participant_id:
+            return True
+
+        logger.warning('Participant %d has sent flag of participant %d for task %d',
+                       attempt.participant_id, owner_id, attempt.task_id)
+        return Checked(False, private_comment='Flag of participant %d. Flag sharing?' % owner_id)
+
+
+class ParticipantFlag(models.Model):
+    checker = models.ForeignKey(ParticipantFlagChecker, related_name='flags')
+
+    participant = models.ForeignKey(contests.models.AbstractParticipant, related_name='+')
+
+    flag = models.CharField(max_length=200)
+
+    flag_digest = models.CharField(max_length=64, help_text='Sha256 of the flag, used for lookups')
+
+    class Meta:
+        unique_together = (('checker', 'participant'), ('checker', 'flag_digest'))
+
+    def __str__(self):
+        return 'Flag of %s' % (self.participant, )
+
+
+class ExternalProgramChecker(AbstractChecker):
+    """
+    Runs the program with participant's answer in stdin. Exit code 0 means correct answer, 1 means wrong one,
+    program's stdout is shown to the participant and stderr is saved as private comment.
+    Other exit codes postpone the attempt for manual check.
+    Attempts are checked by the bounded pool of check workers (see `manage.py check_attempts`),
+    so web workers never start programs and their number limits the number of concurrent programs
+    """
+    program = models.CharField(
+        max_length=1000,
+        help_text='Path to the executable relative to settings.DRAPO_EXTERNAL_CHECKERS_DIR'
+    )
+
+    arguments = models.TextField(blank=True, help_text='Command line arguments, one per line')
+
+    timeout = models.PositiveIntegerField(default=10, help_text='In seconds')
+
+    memory_limit = models.PositiveIntegerField(default=256, help_text='In megabytes')
+
+    def __str__(self):
+        return self.program
+
+    def check_attempt(self, attempt, context):
+        env = {
+            'PATH': os.environ.get('PATH', ''),
+            'DRAPO_CONTEST_ID': str(attempt.contest_id),
+            'DRAPO_TASK_ID': str(attempt.task_id),
+            'DRAPO_PARTICIPANT_ID': str(attempt.participant_id),
+        }
+        result = external.run_program(
+            self.program, self.arguments.splitlines(), attempt.answer, self.timeout, self.memory_limit, env
+        )
+
+        if result.is_timed_out:
+            return Checked(
+                False, private_comment='Checker has been stopped after %d seconds' % self.timeout, is_definitive=False
+            )
+        if result.exit_code not in (0, 1):
+            logger.error('Checker %s has failed with exit code %d: %s', self.program, result.exit_code, result.stderr)
+            return PostponeForManualCheck()
+
+        is_correct = result.exit_code == 0
+        return Checked(
+            is_correct,
+            public_comment=result.stdout,
+            private_comment=result.stderr,
+            score=attempt.task.max_score if is_correct else 0
+        )
+
+
 class Task(models.Model):
     name = models.CharField(max_length=100, help_text='Shows on tasks page')
 
@@ -173,6 +395,36 @@ class Task(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Max score or checker may be changed
+        self.invalidate_checked_answers()
+
+    @property
+    def _checked_answers_version_cache_key(self):
+        return 'drapo:tasks:%d:checked_answers_version' % self.id
+
+    def get_checked_answers_version(self):
+        """ Returns version of remembered verdicts, it changes each time when the task or its checker is changed """
+        key = self._checked_answers_version_cache_key
+        version = cache.get(key)
+        if version is None:
+            # Start from current time, not from 1: see contests.models.Contest.get_scoreboard_version()
+            cache.add(key, int(time.time() * 1000), timeout=None)
+            version = cache.get(key)
+        return version
+
+    def invalidate_checked_answers(self):
+        """ Like contests.models._increment_cache_version(), version is incremented after the commit """
+        def increment():
+            try:
+                cache.incr(self._checked_answers_version_cache_key)
+            except ValueError:
+                # There is no version in the cache yet
+                self.get_checked_answers_version()
+
+        transaction.on_commit(increment)
+
     def check_attempt(self, attempt, context):
         check_result = self.checker.check_attempt(attempt, context)
         if type(check_result) == bool:
@@ -230,6 +482,41 @@ class ContestTasks(models.Model):
         return 'Tasks set for %s' % (self.contest, )
 
 
+class RejudgeSummary:
+    """ Differences between old and new verdicts found by Attempt.rejudge() """
+    def __init__(self):
+        self.checked_count = 0
+        self.changed_count = 0
+        self.became_correct_count = 0
+        self.became_wrong_count = 0
+        self.enqueued_count = 0
+        # task_id -> number of attempts with changed verdict
+        self.changed_by_task = collections.Counter()
+
+    def add(self, attempt, check_result):
+        self.checked_count += 1
+        if attempt.is_checked and attempt.is_correct == check_result.is_correct and \
+           attempt.score == check_result.score and attempt.public_comment == check_result.public_comment and \
+           attempt.private_comment == check_result.private_comment:
+            return False
+
+        self.changed_count += 1
+        self.changed_by_task[attempt.task_id] += 1
+        if check_result.is_correct and not attempt.is_correct:
+            self.became_correct_count += 1
+        if not check_result.is_correct and attempt.is_correct:
+            self.became_wrong_count += 1
+        return True
+
+    def __str__(self):
+        result = 'Checked %d attempts, %d changed: %d became correct, %d became wrong' % (
+            self.checked_count, self.changed_count, self.became_correct_count, self.became_wrong_count
+        )
+        if self.enqueued_count > 0:
+            result += '. %d attempts will be checked by check workers' % self.enqueued_count
+        return result
+
+
 class Attempt(drapo.models.ModelWithTimestamps):
     contest = models.ForeignKey(contests.models.Contest, related_name='attempts')
 
@@ -251,12 +538,273 @@ class Attempt(drapo.models.ModelWithTimestamps):
 
     private_comment = models.TextField(blank=True)
 
+    is_waiting_for_check = models.BooleanField(
+        default=False,
+        db_index=True,
+        help_text='Attempt will be checked by one of check workers'
+    )
+
+    check_lease_until = models.DateTimeField(
+        null=True,
+        default=None,
+        help_text='Attempt is being checked by a worker. After this time other worker can take it'
+    )
+
+    check_lease_token = models.CharField(
+        max_length=20,
+        blank=True,
+        help_text='Random token of the current lease. Worker saves the verdict only if its lease has not been taken over'
+    )
+
+    judge = models.ForeignKey(
+        users.models.User,
+        related_name='+',
+        null=True,
+        blank=True,
+        default=None,
+        on_delete=models.SET_NULL,
+        help_text='Staff member who checks or has checked the attempt manually'
+    )
+
+    judge_lease_until = models.DateTimeField(
+        null=True,
+        default=None,
+        help_text='Attempt is being checked by the judge. After this time other judge can take it'
+    )
+
     def __str__(self):
         return 'Attempt by %s on %s.%s' % (self.author, self.contest, self.task)
 
-    def try_to_check(self):
-        context = {}
-        check_result = self.task.check_attempt(self, context)
+    @property
+    def _checked_answer_cache_key(self):
+        # Answer is compared exactly as checker gets it: case or spaces can matter for some checkers
+        return 'drapo:tasks:%d:checked_answers:%d:%d:%s' % (
+            self.task_id,
+            self.task.get_checked_answers_version(),
+            self.participant_id,
+            TextChecker.get_digest(self.answer),
+        )
+
+    def submit(self):
+        """
+        Checks just created attempt and saves it with the verdict by one INSERT. If task's checker is slow,
+        attempt is saved as waiting for check, so HTTP request doesn't wait for the checker.
+        If the participant has recently sent the same answer on the task, previous verdict is used and the checker
+        is not run. Such duplicate is saved only if settings.DRAPO_STORE_DUPLICATE_ATTEMPTS is True,
+        otherwise it's counted in ParticipantTaskResult.duplicates_count
+        """
+        verdict = cache.get(self._checked_answer_cache_key)
+        check_result = None
+        if verdict is not None:
+            self.is_checked = True
+            self.is_correct, self.score, self.public_comment, self.private_comment = verdict
+            if not settings.DRAPO_STORE_DUPLICATE_ATTEMPTS:
+                ParticipantTaskResult.objects.filter(
+                    participant_id=self.participant_id,
+                    task_id=self.task_id
+                ).update(duplicates_count=F('duplicates_count') + 1)
+                return
+        elif self.task.checker.is_fast:
+            check_result = self.task.check_attempt(self, {})
+            self._set_check_result(check_result)
+        else:
+            self.is_waiting_for_check = True
+
+        self.save()
+        if check_result is not None:
+            self._remember_verdict(check_result)
+
+        ParticipantTaskResult.update(self.contest_id, self.participant_id, self.task_id)
+        if self.is_checked:
+            self.contest.invalidate_scoreboard()
+
+    def _remember_verdict(self, check_result):
+        """ Only definitive verdicts of deterministic checkers are remembered """
+        if not (check_result.is_checked and check_result.is_definitive and self.task.checker.is_deterministic):
+            return
+        cache.set(
+            self._checked_answer_cache_key,
+            (self.is_correct, self.score, self.public_comment, self.private_comment),
+            timeout=settings.DRAPO_CHECKED_ANSWERS_MEMO_TIMEOUT
+        )
+
+    @classmethod
+    def claim_for_check(cls):
+        """
+        Returns next attempt waiting for check and leases it to the calling worker, or None.
+        Lease is taken by the conditional UPDATE, so each attempt is given to one worker only.
+        If worker dies, attempt is given to another one after the lease expires.
+        Attempts are leased one by one: lease covers the check of one attempt, not of the whole batch
+        """
+        now = timezone.now()
+        lease_until = now + datetime.timedelta(seconds=settings.DRAPO_CHECK_LEASE_DURATION)
+        is_available = Q(is_waiting_for_check=True) & (Q(check_lease_until__isnull=True) | Q(check_lease_until__lt=now))
+
+        while True:
+            candidates_ids = list(cls.objects.filter(is_available).order_by('id').values_list('id', flat=True)[:10])
+            if not candidates_ids:
+                return None
+            for attempt_id in candidates_ids:
+                token = generate_random_secret_string(20)
+                if cls.objects.filter(is_available, id=attempt_id).update(
+                        check_lease_until=lease_until, check_lease_token=token
+                ) > 0:
+                    return cls.objects.select_related('task', 'contest').get(id=attempt_id)
+
+    @classmethod
+    def claim_for_judge(cls, contest, judge):
+        """
+        Returns next attempt of the contest waiting for manual check and leases it to the judge, or None.
+        Like in claim_for_check(), lease is taken by the conditional UPDATE, so judges working in parallel
+        never get the same attempt. Attempt which is leased to the judge already is returned first
+        """
+        now = timezone.now()
+        lease_until = now + datetime.timedelta(seconds=settings.DRAPO_JUDGE_LEASE_DURATION)
+        pending = cls.objects.filter(contest=contest, is_checked=False, is_waiting_for_check=False)
+
+        leased_attempt = pending.filter(judge=judge, judge_lease_until__gte=now).order_by('id').first()
+        if leased_attempt is not None:
+            return leased_attempt
+
+        is_available = Q(judge_lease_until__isnull=True) | Q(judge_lease_until__lt=now)
+        while True:
+            candidates_ids = list(pending.filter(is_available).order_by('id').values_list('id', flat=True)[:10])
+            if not candidates_ids:
+                return None
+            for attempt_id in candidates_ids:
+                if pending.filter(is_available, id=attempt_id).update(judge=judge, judge_lease_until=lease_until) > 0:
+                    return cls.objects.get(id=attempt_id)
+
+    def save_judge_verdict(self, judge, is_correct, public_comment=''):
+        """ Saves verdict of manual check. Returns False if the attempt has been checked already, i.e. by other judge """
+        score = self.task.max_score if is_correct else 0
+        updated_count = Attempt.objects.filter(id=self.id, is_checked=False).update(
+            is_checked=True,
+            is_correct=is_correct,
+            score=score,
+            public_comment=public_comment,
+            judge=judge,
+            judge_lease_until=None,
+            updated_at=timezone.now(),
+        )
+        if updated_count == 0:
+            return False
+
+        self.refresh_from_db()
+        self.forget_verdict()
+        ParticipantTaskResult.update(self.contest_id, self.participant_id, self.task_id)
+        self.contest.invalidate_scoreboard()
+        return True
+
+    def forget_verdict(self):
+        """ Should be called when the verdict is changed by hand: repeated answer will be checked again """
+        cache.delete(self._checked_answer_cache_key)
+
+    def check_by_worker(self):
+        """
+        Checks the attempt leased by claim_for_check() and saves the verdict by one conditional UPDATE.
+        If the lease has expired and the attempt has been taken by another worker, nothing is saved
+        and False is returned
+        """
+        check_result = self.task.check_attempt(self, {})
+        self._set_check_result(check_result)
+        self.is_waiting_for_check = False
+        self.updated_at = timezone.now()
+        is_saved = Attempt.objects.filter(
+            id=self.id, is_waiting_for_check=True, check_lease_token=self.check_lease_token
+        ).update(
+            is_checked=self.is_checked,
+            is_correct=self.is_correct,
+            score=self.score,
+            public_comment=self.public_comment,
+            private_comment=self.private_comment,
+            is_waiting_for_check=False,
+            check_lease_until=None,
+            check_lease_token='',
+            updated_at=self.updated_at,
+        ) > 0
+        if not is_saved:
+            return False
+        self.check_lease_until = None
+        self.check_lease_token = ''
+
+        if self.is_checked:
+            self._remember_verdict(check_result)
+            ParticipantTaskResult.update(self.contest_id, self.participant_id, self.task_id)
+            self.contest.invalidate_scoreboard()
+        return True
+
+    @classmethod
+    def rejudge(cls, attempts, chunk_size=1000, enqueue_slow_checks=False):
+        """
+        Checks attempts from the queryset again and saves changed verdicts. Returns RejudgeSummary.
+        Attempts are read in chunks by id, so memory doesn't depend on the number of attempts.
+        Changed attempts of the chunk are written by one UPDATE per distinct verdict.
+        Attempts postponed by the checker (i.e. manually checked) and waiting for check workers are not changed.
+        If enqueue_slow_checks is True, attempts for slow checkers are given to check workers instead,
+        it's used in HTTP requests
+        """
+        attempts = attempts.filter(is_waiting_for_check=False).order_by('id')
+        summary = RejudgeSummary()
+        tasks = {}
+        changed_results = set()
+
+        last_id = 0
+        while True:
+            chunk = list(attempts.filter(id__gt=last_id)[:chunk_size].iterator())
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+
+            # verdict -> ids of attempts
+            changed = collections.defaultdict(list)
+            enqueued_ids = []
+            for attempt in chunk:
+                if attempt.task_id not in tasks:
+                    tasks[attempt.task_id] = Task.objects.get(pk=attempt.task_id)
+                # Checker is loaded once per task, not once per attempt
+                attempt.task = tasks[attempt.task_id]
+
+                if enqueue_slow_checks and not attempt.task.checker.is_fast:
+                    enqueued_ids.append(attempt.id)
+                    continue
+
+                check_result = attempt.task.check_attempt(attempt, {})
+                if not check_result.is_checked or not summary.add(attempt, check_result):
+                    continue
+                verdict = (check_result.is_correct, check_result.score,
+                           check_result.public_comment, check_result.private_comment)
+                changed[verdict].append(attempt.id)
+                changed_results.add((attempt.contest_id, attempt.participant_id, attempt.task_id))
+
+            now = timezone.now()
+            with transaction.atomic():
+                for (is_correct, score, public_comment, private_comment), ids in changed.items():
+                    cls.objects.filter(id__in=ids).update(
+                        is_checked=True,
+                        is_correct=is_correct,
+                        score=score,
+                        public_comment=public_comment,
+                        private_comment=private_comment,
+                        updated_at=now,
+                    )
+                cls.objects.filter(id__in=enqueued_ids).update(
+                    is_waiting_for_check=True,
+                    check_lease_until=None,
+                    updated_at=now,
+                )
+            summary.enqueued_count += len(enqueued_ids)
+
+        for contest_id, participant_id, task_id in changed_results:
+            ParticipantTaskResult.update(contest_id, participant_id, task_id)
+        for contest in contests.models.Contest.objects.filter(id__in={r[0] for r in changed_results}):
+            contest.invalidate_scoreboard()
+        for task in tasks.values():
+            task.invalidate_checked_answers()
+
+        return summary
+
+    def _set_check_result(self, check_result):
         if check_result.is_checked:
             self.is_checked = True
             self.is_correct = check_result.is_correct
@@ -264,7 +812,189 @@ class Attempt(drapo.models.ModelWithTimestamps):
             self.private_comment = check_result.private_comment
             self.score = check_result.score
 
+    def try_to_check(self):
+        context = {}
+        check_result = self.task.check_attempt(self, context)
+        self._set_check_result(check_result)
+        if self.is_checked:
             self.save()
+            self._remember_verdict(check_result)
+
+        ParticipantTaskResult.update(self.contest_id, self.participant_id, self.task_id)
+        if self.is_checked:
+            self.contest.invalidate_scoreboard()
+
+
+class ParticipantTaskResult(models.Model):
+    """
+    Materialized summary of participant's attempts on the task. Scoreboard reads these rows
+    instead of scanning all attempts of the contest, so they must be updated by
+    ParticipantTaskResult.update() each time when attempt is created, checked or edited
+    """
+    contest = models.ForeignKey(contests.models.Contest, related_name='results')
+
+    participant = models.ForeignKey(contests.models.AbstractParticipant, related_name='results')
+
+    task = models.ForeignKey(Task, related_name='results')
+
+    tries_count = models.PositiveIntegerField(default=0)
+
+    best_score = models.IntegerField(
+        null=True,
+        default=None,
+        help_text='Maximum score among checked attempts or None if there are no checked attempts'
+    )
+
+    best_score_time = models.DateTimeField(
+        null=True,
+        default=None,
+        help_text='Creation time of the first attempt with the best score'
+    )
+
+    first_success_time = models.DateTimeField(null=True, default=None)
+
+    last_success_time = models.DateTimeField(null=True, default=None)
+
+    duplicates_count = models.PositiveIntegerField(
+        default=0,
+        help_text='Number of repeated answers which were not saved as attempts. '
+                  'See settings.DRAPO_STORE_DUPLICATE_ATTEMPTS'
+    )
+
+    class Meta:
+        unique_together = ('participant', 'task')
+
+    def __str__(self):
+        return 'Result of %s on %s' % (self.participant, self.task)
+
+    @property
+    def is_solved(self):
+        return self.first_success_time is not None
+
+    @classmethod
+    def _lock(cls, contest_id, participant_id, task_id):
+        """ Locks the row for the pair (participant, task), creates an empty one if needed. Returns old first_success_time """
+        results = cls.objects.select_for_update().filter(participant_id=participant_id, task_id=task_id)
+        old_result = list(results.values_list('first_success_time', flat=True)[:1])
+        if old_result:
+            return old_result[0]
+        try:
+            with transaction.atomic():
+                cls.objects.create(contest_id=contest_id, participant_id=participant_id, task_id=task_id)
+            return None
+        except IntegrityError:
+            # Result has been created by the concurrent request, wait for its transaction
+            return results.values_list('first_success_time', flat=True).get()
+
+    @classmethod
+    def update(cls, contest_id, participant_id, task_id):
+        """
+        Recalculates result for the pair (participant, task) from its attempts.
+        The row is locked before reading attempts, so concurrent updates of the pair are serialized
+        and the stale result can't overwrite the fresh one
+        """
+        with transaction.atomic(savepoint=False):
+            old_first_success_time = cls._lock(contest_id, participant_id, task_id)
+
+            attempts = Attempt.objects.filter(contest_id=contest_id, participant_id=participant_id, task_id=task_id)
+
+            best_attempt = attempts.filter(is_checked=True).order_by('-score', 'id').values_list('score', 'created_at').first()
+            best_score, best_score_time = best_attempt if best_attempt is not None else (None, None)
+
+            success_time = Case(When(is_correct=True, then=F('created_at')))
+            values = attempts.aggregate(
+                tries_count=Count('id'),
+                first_success_time=Min(success_time),
+                last_success_time=Max(success_time),
+            )
+            values.update(best_score=best_score, best_score_time=best_score_time)
+            cls.objects.filter(participant_id=participant_id, task_id=task_id).update(**values)
+
+            was_solved = old_first_success_time is not None
+            is_solved = values['first_success_time'] is not None
+            if was_solved != is_solved:
+                is_solved_by_anyone_changed = ContestSolvedTask.update(contest_id, task_id, is_solved)
+                # Solved tasks open next ones
+                policy = ByCategoriesTasksOpeningPolicy.objects.filter(contest_id=contest_id).first()
+                if policy is not None and not policy.opens_for_all_participants:
+                    policy.contest.invalidate_opened_tasks(participant_id)
+                if policy is not None and policy.opens_for_all_participants and is_solved_by_anyone_changed:
+                    policy.contest.invalidate_opened_tasks()
+
+    @classmethod
+    def rebuild_for_contest(cls, contest):
+        """ Recalculates results for all pairs (participant, task) which have attempts in the contest """
+        pairs = contest.attempts.values_list('participant_id', 'task_id').distinct()
+        with transaction.atomic():
+            cls.objects.filter(contest=contest).delete()
+            ContestSolvedTask.objects.filter(contest=contest).delete()
+            for participant_id, task_id in pairs:
+                cls.update(contest.id, participant_id, task_id)
+
+    @classmethod
+    def get_solve_places(cls, contest, max_place):
+        """
+        Returns list of (task_id, participant_id, place) for participants who solved the task in first max_place.
+        Place is calculated in the database by one aggregate query: it's the number of visible and not disqualified
+        participants solved the task earlier plus one. Ties are broken by participant's id
+        """
+        solved = cls.objects.filter(
+            first_success_time__isnull=False,
+            participant__is_visible_in_scoreboard=True,
+            participant__is_disqualified=False,
+        )
+        solved_earlier = solved.filter(
+            contest=OuterRef('contest'),
+            task=OuterRef('task'),
+        ).filter(
+            Q(first_success_time__lt=OuterRef('first_success_time')) |
+            Q(first_success_time=OuterRef('first_success_time'), participant_id__lt=OuterRef('participant_id'))
+        ).order_by().values('task').annotate(count=Count('*')).values('count')
+
+        places = solved.filter(contest=contest).annotate(
+            solved_earlier_count=Coalesce(Subquery(solved_earlier, output_field=IntegerField()), 0)
+        ).filter(
+            solved_earlier_count__lt=max_place
+        ).order_by().values_list('task_id', 'participant_id', 'solved_earlier_count')
+        return [(task_id, participant_id, count + 1) for task_id, participant_id, count in places]
+
+
+class ContestSolvedTask(models.Model):
+    """
+    Tasks solved by anyone in the contest. Rows are added when the task is solved first time
+    and removed when the last solution is rejected, see ParticipantTaskResult.update()
+    """
+    contest = models.ForeignKey(contests.models.Contest, related_name='+')
+
+    task = models.ForeignKey(Task, related_name='+')
+
+    class Meta:
+        unique_together = ('contest', 'task')
+
+    def __str__(self):
+        return '%s is solved in %s' % (self.task, self.contest)
+
+    @classmethod
+    def update(cls, contest_id, task_id, is_solved_by_participant):
+        """ Called when the participant solves the task or loses the solution. Returns True if the set is changed """
+        rows = cls.objects.filter(contest_id=contest_id, task_id=task_id)
+        if is_solved_by_participant:
+            if rows.exists():
+                return False
+            try:
+                with transaction.atomic():
+                    cls.objects.create(contest_id=contest_id, task_id=task_id)
+            except IntegrityError:
+                # Task has been solved by other participant at the same time
+                return False
+            return True
+
+        if ParticipantTaskResult.objects.filter(
+            contest_id=contest_id, task_id=task_id, first_success_time__isnull=False
+        ).exists():
+            return False
+        deleted_count, _ = rows.delete()
+        return deleted_count > 0
 
 
 class AbstractTasksOpeningPolicy(polymorphic.models.PolymorphicModel):
@@ -275,9 +1005,31 @@ class AbstractTasksOpeningPolicy(polymorphic.models.PolymorphicModel):
         verbose_name = 'Task opening policy'
         verbose_name_plural = 'Task opening policies'
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.contest.invalidate_opened_tasks()
+
+    def delete(self, *args, **kwargs):
+        super().delete(*args, **kwargs)
+        self.contest.invalidate_opened_tasks()
+
     def get_open_tasks(self, participant):
+        """ Returns set of ids of tasks opened for the participant. Participant is None for guests """
+        participant_id = participant.id if participant is not None else None
+        return self.get_open_tasks_for_participants([participant])[participant_id]
+
+    def get_open_tasks_for_participants(self, participants):
+        """
+        Returns dict: participant's id -> set of ids of opened tasks, key is None for guests.
+        Policy loads all data it needs once for all participants, so number of queries doesn't depend on their number.
+        Returned sets can be shared between participants, don't modify them
+        """
         raise NotImplementedError()
 
+    @staticmethod
+    def _get_participants_ids(participants):
+        return [participant.id if participant is not None else None for participant in participants]
+
 
 class ByCategoriesTasksOpeningPolicy(AbstractTasksOpeningPolicy):
     opens_for_all_participants = models.BooleanField(default=True)
@@ -292,34 +1044,33 @@ class ByCategoriesTasksOpeningPolicy(AbstractTasksOpeningPolicy):
         verbose_name = 'Task opening policy: by categories'
         verbose_name_plural = 'Task opening policies: by categories'
 
-    def get_open_tasks(self, participant):
+    def _get_opened_tasks(self, done_tasks):
+        """ First task of each category is opened, other ones are opened when previous task is done """
+        opened_tasks = set()
+        for tasks_ids in self.contest.tasks_tree:
+            prev_task_id = None
+            for task_id in tasks_ids:
+                if prev_task_id is None or prev_task_id in done_tasks:
+                    opened_tasks.add(task_id)
+                prev_task_id = task_id
+        return opened_tasks
+
+    def get_open_tasks_for_participants(self, participants):
+        participants_ids = self._get_participants_ids(participants)
+
         if self.opens_for_all_participants:
-            done_tasks = set(self.contest.attempts
-                                         .filter(is_correct=True)
-                                         .values_list('task_id', flat=True))
-        else:
-            done_tasks = set(self.contest.attempts
-                                         .filter(participant=participant, is_correct=True)
-                                         .values_list('task_id', flat=True))
-
-        opened_tasks = []
-        if self.contest.tasks_grouping == contests.models.TasksGroping.ByCategories:
-            for category in self.contest.categories:
-                prev_task = None
-                for task in category.tasks.all():
-                    if prev_task is None or prev_task.id in done_tasks:
-                        opened_tasks.append(task.id)
-                    prev_task = task
-        elif self.contest.tasks_grouping == contests.models.TasksGroping.OneByOne:
-            prev_task = None
-            for task in self.contest.tasks:
-                if prev_task is None or prev_task.id in done_tasks:
-                    opened_tasks.append(task.id)
-                prev_task = task
-        else:
-            raise ValueError('Invalid tasks grouping')
+            solved_tasks = set(ContestSolvedTask.objects.filter(contest_id=self.contest_id).values_list('task_id', flat=True))
+            opened_tasks = self._get_opened_tasks(solved_tasks)
+            return {participant_id: opened_tasks for participant_id in participants_ids}
 
-        return opened_tasks
+        correct_attempts = self.contest.attempts.filter(is_correct=True)
+        if len(participants_ids) == 1:
+            correct_attempts = correct_attempts.filter(participant_id=participants_ids[0])
+        done_tasks = collections.defaultdict(set)
+        for participant_id, task_id in correct_attempts.values_list('participant_id', 'task_id').distinct():
+            done_tasks[participant_id].add(task_id)
+
+        return {participant_id: self._get_opened_tasks(done_tasks[participant_id]) for participant_id in participants_ids}
 
 
 class AllTasksOpenedOpeningPolicy(AbstractTasksOpeningPolicy):
@@ -327,16 +1078,9 @@ class AllTasksOpenedOpeningPolicy(AbstractTasksOpeningPolicy):
         verbose_name = 'Task opening policy: all'
         verbose_name_plural = 'Task opening policies: all'
 
-    def get_open_tasks(self, participant):
-        if self.contest.tasks_grouping == contests.models.TasksGroping.ByCategories:
-            tasks_ids = []
-            for category in self.contest.categories:
-                tasks_ids.extend(category.tasks.values_list('id', flat=True))
-            return tasks_ids
-        elif self.contest.tasks_grouping == contests.models.TasksGroping.OneByOne:
-            return [task.id for task in self.contest.tasks]
-        else:
-            raise ValueError('Invalid tasks grouping')
+    def get_open_tasks_for_participants(self, participants):
+        tasks_ids = {task_id for tasks_ids in self.contest.tasks_tree for task_id in tasks_ids}
+        return {participant_id: tasks_ids for participant_id in self._get_participants_ids(participants)}
 
 
 class ManualTasksOpeningPolicy(AbstractTasksOpeningPolicy):
@@ -344,12 +1088,24 @@ class ManualTasksOpeningPolicy(AbstractTasksOpeningPolicy):
         verbose_name = 'Task opening policy: manual'
         verbose_name_plural = 'Task opening policies: manual'
 
-    def get_open_tasks(self, participant):
-        return ManualOpenedTask.objects.filter(
-            contest=self.contest
-        ).filter(
-            Q(participant__isnull=True) | Q(participant=participant)
-        ).values_list('task_id', flat=True)
+    def get_open_tasks_for_participants(self, participants):
+        participants_ids = self._get_participants_ids(participants)
+        opens = ManualOpenedTask.objects.filter(contest_id=self.contest_id)
+        if len(participants_ids) == 1:
+            opens = opens.filter(Q(participant__isnull=True) | Q(participant_id=participants_ids[0]))
+
+        opened_for_all = set()
+        opened_for_participant = collections.defaultdict(set)
+        for participant_id, task_id in opens.values_list('participant_id', 'task_id'):
+            if participant_id is None:
+                opened_for_all.add(task_id)
+            else:
+                opened_for_participant[participant_id].add(task_id)
+
+        return {
+            participant_id: opened_for_all | opened_for_participant[participant_id]
+            for participant_id in participants_ids
+        }
 
 
 class ManualOpenedTask(models.Model):
@@ -363,3 +1119,11 @@ class ManualOpenedTask(models.Model):
         default=None,
         help_text='Set NULL to open task for everyone'
     )
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.contest.invalidate_opened_tasks(self.participant_id)
+
+    def delete(self, *args, **kwargs):
+        super().delete(*args, **kwargs)
+        self.contest.invalidate_opened_tasks(self.participant_id)
@@ -1,3 +1,407 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+import contests.models
+from contests.tests import create_contest, create_task, create_participant, LOCMEM_CACHES
+from contests.views import get_opened_tasks_ids, get_opened_tasks_ids_for_participants
+import taskbased.categories.models as categories_models
+from . import models
+
+
+class CheckQueueTest(TestCase):
+    def setUp(self):
+        self.contest = create_contest()
+        self.task = create_task(self.contest, 'flag')
+        self.participant = create_participant(self.contest, 'user')
+
+    def _create_attempt(self, answer):
+        attempt = models.Attempt(
+            contest=self.contest,
+            task=self.task,
+            participant=self.participant,
+            author_id=self.participant.user_id,
+            answer=answer,
+        )
+        attempt.submit()
+        return attempt
+
+    def test_fast_checker_checks_inline(self):
+        attempt = self._create_attempt('flag')
+        self.assertFalse(attempt.is_waiting_for_check)
+        self.assertTrue(attempt.is_checked)
+        self.assertTrue(attempt.is_correct)
+
+    def test_slow_checker_checks_by_worker(self):
+        self.task.checker.is_fast = False
+        attempt = self._create_attempt('flag')
+        self.assertTrue(attempt.is_waiting_for_check)
+        self.assertFalse(attempt.is_checked)
+        self.assertEqual(models.ParticipantTaskResult.objects.get(participant=self.participant).tries_count, 1)
+
+        claimed = models.Attempt.claim_for_check()
+        self.assertEqual(claimed.id, attempt.id)
+        # Attempt is leased to the first worker already
+        self.assertIsNone(models.Attempt.claim_for_check())
+
+        self.assertTrue(claimed.check_by_worker())
+        attempt.refresh_from_db()
+        self.assertFalse(attempt.is_waiting_for_check)
+        self.assertIsNone(attempt.check_lease_until)
+        self.assertTrue(attempt.is_correct)
+        self.assertTrue(models.ParticipantTaskResult.objects.get(participant=self.participant).is_solved)
+
+    @override_settings(DRAPO_CHECK_LEASE_DURATION=-1)
+    def test_expired_lease_is_not_saved(self):
+        self.task.checker.is_fast = False
+        attempt = self._create_attempt('flag')
+        slow_worker_attempt = models.Attempt.claim_for_check()
+        # Lease has expired, so attempt is given to another worker
+        fast_worker_attempt = models.Attempt.claim_for_check()
+        self.assertEqual(fast_worker_attempt.id, attempt.id)
+
+        self.assertTrue(fast_worker_attempt.check_by_worker())
+        self.assertFalse(slow_worker_attempt.check_by_worker())
+        attempt.refresh_from_db()
+        self.assertTrue(attempt.is_correct)
+        self.assertFalse(attempt.is_waiting_for_check)
+
+
+class RegExpCheckerTest(TestCase):
+    def setUp(self):
+        self.checker = models.RegExpChecker.objects.create(pattern='fl(a)+g', flag_ignore_case=True)
+
+    def _check(self, answer):
+        return self.checker.check_attempt(models.Attempt(answer=answer), {})
+
+    def test_compiled_regexp_is_cached(self):
+        self.assertIs(self.checker.compiled_regexp, self.checker.compiled_regexp)
+        self.assertTrue(self._check('FLAAG'))
+
+        self.checker.pattern = 'other'
+        self.checker.save()
+        self.assertFalse(self._check('FLAAG'))
+        self.assertTrue(self._check('OTHER'))
+
+    @override_settings(DRAPO_REGEXP_MATCH_TIMEOUT=0.1)
+    def test_slow_match_is_failed_check(self):
+        self.checker.pattern = '(a|aa)+b'
+        self.checker.save()
+
+        check_result = self._check('a' * 50)
+        self.assertTrue(check_result.is_checked)
+        self.assertFalse(check_result.is_correct)
+
+
+class TextCheckerTest(TestCase):
+    def test_case_insensitive(self):
+        checker = models.TextChecker.objects.create(answer='Straße')
+        self.assertTrue(checker.check_attempt(models.Attempt(answer='STRASSE'), {}))
+        self.assertFalse(checker.check_attempt(models.Attempt(answer='strase'), {}))
+
+    def test_case_sensitive(self):
+        checker = models.TextChecker.objects.create(answer='Flag', case_sensitive=True)
+        self.assertTrue(checker.check_attempt(models.Attempt(answer='Flag'), {}))
+        self.assertFalse(checker.check_attempt(models.Attempt(answer='flag'), {}))
+
+    def test_digest_is_updated_on_save(self):
+        checker = models.TextChecker.objects.create(answer='flag')
+        checker.answer = 'other'
+        checker.save()
+        self.assertTrue(checker.check_attempt(models.Attempt(answer='OTHER'), {}))
+        self.assertFalse(checker.check_attempt(models.Attempt(answer='flag'), {}))
+
+
+# Cached data is invalidated after the commit, so each change must be really committed
+class DuplicateAttemptsTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.contest = create_contest()
+        self.task = create_task(self.contest, 'flag')
+        self.participant = create_participant(self.contest, 'user')
+
+    def _submit(self, answer):
+        attempt = models.Attempt(
+            contest=self.contest,
+            task=self.task,
+            participant=self.participant,
+            author_id=self.participant.user_id,
+            answer=answer,
+        )
+        attempt.submit()
+        return attempt
+
+    def _get_result(self):
+        return models.ParticipantTaskResult.objects.get(participant=self.participant, task=self.task)
+
+    def test_duplicate_does_not_run_checker(self):
+        self.assertFalse(self._submit('wrong').is_correct)
+        with mock.patch.object(models.TextChecker, 'check_attempt') as check_attempt:
+            attempt = self._submit('wrong')
+        check_attempt.assert_not_called()
+        self.assertTrue(attempt.is_checked)
+        self.assertFalse(attempt.is_correct)
+        self.assertIsNotNone(attempt.id)
+        self.assertEqual(self._get_result().tries_count, 2)
+
+    @override_settings(DRAPO_STORE_DUPLICATE_ATTEMPTS=False)
+    def test_duplicate_is_counted_only(self):
+        self._submit('wrong')
+        attempt = self._submit('wrong')
+        self.assertIsNone(attempt.id)
+        self.assertEqual(models.Attempt.objects.count(), 1)
+        result = self._get_result()
+        self.assertEqual(result.tries_count, 1)
+        self.assertEqual(result.duplicates_count, 1)
+
+    def test_checker_change_forgets_verdicts(self):
+        self._submit('new flag')
+        checker = self.task.checker
+        checker.answer = 'new flag'
+        checker.save()
+        self.assertTrue(self._submit('new flag').is_correct)
+
+    def test_not_definitive_verdict_is_not_remembered(self):
+        timed_out = models.Checked(False, private_comment='Timed out', is_definitive=False)
+        with mock.patch.object(models.TextChecker, 'check_attempt', return_value=timed_out):
+            self.assertFalse(self._submit('flag').is_correct)
+        self.assertTrue(self._submit('flag').is_correct)
+
+    def test_judge_verdict_forgets_remembered_one(self):
+        attempt = self._submit('wrong')
+        models.Attempt.objects.filter(id=attempt.id).update(is_checked=False)
+        self.assertTrue(attempt.save_judge_verdict(self.participant.user, True))
+        with mock.patch.object(models.TextChecker, 'check_attempt', return_value=True) as check_attempt:
+            self.assertTrue(self._submit('wrong').is_correct)
+        check_attempt.assert_called_once()
+
+
+class RejudgeTest(TestCase):
+    def setUp(self):
+        self.contest = create_contest()
+        self.task = create_task(self.contest, 'flag')
+        self.participants = [create_participant(self.contest, 'user%d' % i) for i in range(3)]
+
+    def _submit(self, participant, answer):
+        attempt = models.Attempt(
+            contest=self.contest,
+            task=self.task,
+            participant=participant,
+            author_id=participant.user_id,
+            answer=answer,
+        )
+        attempt.submit()
+        return attempt
+
+    def test_rejudge_after_checker_fix(self):
+        for participant in self.participants:
+            self._submit(participant, 'flag')
+            self._submit(participant, 'fixed flag')
+        checker = self.task.checker
+        checker.answer = 'fixed flag'
+        checker.save()
+
+        output = io.StringIO()
+        call_command('rejudge', task=self.task.id, chunk_size=2, stdout=output)
+
+        self.assertIn('Checked 6 attempts, 6 changed: 3 became correct, 3 became wrong', output.getvalue())
+        self.assertEqual(
+            set(models.Attempt.objects.filter(is_correct=True).values_list('answer', flat=True)),
+            {'fixed flag'}
+        )
+        results = models.ParticipantTaskResult.objects.filter(task=self.task)
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(result.is_solved for result in results))
+
+    def test_manually_checked_attempts_are_not_changed(self):
+        attempt = self._submit(self.participants[0], 'flag')
+        with mock.patch.object(models.Task, 'check_attempt', return_value=models.PostponeForManualCheck()):
+            summary = models.Attempt.rejudge(models.Attempt.objects.all())
+        self.assertEqual(summary.changed_count, 0)
+        attempt.refresh_from_db()
+        self.assertTrue(attempt.is_correct)
+
+
+class ExternalProgramCheckerTest(TestCase):
+    def setUp(self):
+        self.checkers_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.checkers_dir.cleanup)
+        self._write_program('check.sh', '#!/bin/sh\nread answer\necho "Hello, $answer"\n[ "$answer" = flag ]\n')
+        self._write_program('sleep.sh', '#!/bin/sh\nsleep 10\n')
+
+        self.contest = create_contest()
+        self.task = create_task(self.contest, 'flag')
+        self.participant = create_participant(self.contest, 'user')
+
+    def _write_program(self, name, source):
+        path = os.path.join(self.checkers_dir.name, name)
+        with open(path, 'w') as f:
+            f.write(source)
+        os.chmod(path, 0o755)
+
+    def _check(self, program, answer, timeout=10):
+        checker = models.ExternalProgramChecker(program=program, timeout=timeout)
+        attempt = models.Attempt(contest=self.contest, task=self.task, participant=self.participant, answer=answer)
+        with override_settings(DRAPO_EXTERNAL_CHECKERS_DIR=self.checkers_dir.name):
+            return checker.check_attempt(attempt, {})
+
+    def test_exit_code_is_verdict(self):
+        result = self._check('check.sh', 'flag')
+        self.assertTrue(result.is_correct)
+        self.assertEqual(result.score, self.task.max_score)
+        self.assertEqual(result.public_comment, 'Hello, flag\n')
+        self.assertFalse(self._check('check.sh', 'wrong').is_correct)
+
+    def test_slow_program_is_killed(self):
+        result = self._check('sleep.sh', 'flag', timeout=1)
+        self.assertTrue(result.is_checked)
+        self.assertFalse(result.is_correct)
+
+    def test_program_outside_of_checkers_dir(self):
+        with self.assertRaises(ValueError):
+            self._check('../../bin/true', 'flag')
+
+
+class ParticipantFlagCheckerTest(TestCase):
+    def setUp(self):
+        self.contest = create_contest()
+        self.task = create_task(self.contest, 'flag')
+        self.task.checker = models.ParticipantFlagChecker.objects.create()
+        self.task.save()
+        self.participants = [create_participant(self.contest, 'user%d' % i) for i in range(3)]
+
+    def _check(self, participant, answer):
+        attempt = models.Attempt(contest=self.contest, task=self.task, participant=participant, answer=answer)
+        with self.assertNumQueries(1):
+            return self.task.check_attempt(attempt, {})
+
+    def test_flags(self):
+        output = io.StringIO()
+        call_command('generate_flags', self.task.id, stdout=output, stderr=io.StringIO())
+        flags = dict(self.task.checker.flags.values_list('participant_id', 'flag'))
+        self.assertEqual(len(set(flags.values())), 3)
+        self.assertIn(flags[self.participants[0].id], output.getvalue())
+        # Flags aren't generated again
+        self.assertEqual(self.task.checker.generate_flags(self.participants), 0)
+
+        self.assertTrue(self._check(self.participants[0], flags[self.participants[0].id]).is_correct)
+        self.assertFalse(self._check(self.participants[0], 'flag_wrong').is_correct)
+
+        with self.assertLogs(models.logger, 'WARNING'):
+            result = self._check(self.participants[1], flags[self.participants[0].id])
+        self.assertFalse(result.is_correct)
+        self.assertIn('Flag sharing', result.private_comment)
+
+
+# Cached data is invalidated after the commit, so each change must be really committed
+@override_settings(CACHES=LOCMEM_CACHES)
+class TasksOpeningPoliciesTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.contest = create_contest(tasks_grouping=contests.models.TasksGroping.ByCategories)
+        contest_categories = categories_models.ContestCategories.objects.create(contest=self.contest)
+        self.tasks = []
+        for i in range(2):
+            category = categories_models.Category.objects.create(name='Category %d' % i, description='')
+            contest_categories.categories.add(category)
+            for j in range(3):
+                task = create_task(self.contest, 'flag%d%d' % (i, j))
+                category.tasks.add(task)
+                self.tasks.append(task)
+
+        models.ByCategoriesTasksOpeningPolicy.objects.create(contest=self.contest, opens_for_all_participants=False)
+        models.ManualTasksOpeningPolicy.objects.create(contest=self.contest)
+        self.participants = [create_participant(self.contest, 'user%d' % i) for i in range(5)]
+
+        participant = self.participants[0]
+        models.Attempt(
+            contest=self.contest, task=self.tasks[0], participant=participant, author=participant.user, answer='flag00'
+        ).submit()
+        models.ManualOpenedTask.objects.create(contest=self.contest, task=self.tasks[5], participant=self.participants[1])
+        models.ManualOpenedTask.objects.create(contest=self.contest, task=self.tasks[2])
+
+    def _get_contest(self):
+        return contests.models.TaskBasedContest.objects.get(id=self.contest.id)
+
+    def test_batch_is_equal_to_single(self):
+        opened = get_opened_tasks_ids_for_participants(self._get_contest(), self.participants + [None])
+        for participant in self.participants + [None]:
+            participant_id = participant.id if participant is not None else None
+            self.assertEqual(opened[participant_id], get_opened_tasks_ids(self._get_contest(), participant))
+
+        first_tasks = {self.tasks[0].id, self.tasks[3].id, self.tasks[2].id}
+        self.assertEqual(opened[self.participants[0].id], first_tasks | {self.tasks[1].id})
+        self.assertEqual(opened[self.participants[1].id], first_tasks | {self.tasks[5].id})
+        self.assertEqual(opened[None], first_tasks)
+
+    def test_queries_count_does_not_depend_on_participants(self):
+        # Warm up content types cache of django-polymorphic
+        get_opened_tasks_ids_for_participants(self._get_contest(), self.participants[:1])
+        contest = self._get_contest()
+        with CaptureQueriesContext(connection) as queries:
+            get_opened_tasks_ids_for_participants(contest, self.participants[:2])
+        contest = self._get_contest()
+        with self.assertNumQueries(len(queries)):
+            get_opened_tasks_ids_for_participants(contest, self.participants)
+
+    def test_opened_tasks_are_cached_until_changes(self):
+        participant = self.participants[2]
+        first_tasks = {self.tasks[0].id, self.tasks[3].id, self.tasks[2].id}
+        other_participant = self.participants[3]
+        self.assertEqual(get_opened_tasks_ids(self._get_contest(), participant), first_tasks)
+        self.assertEqual(get_opened_tasks_ids(self._get_contest(), other_participant), first_tasks)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_opened_tasks_ids(self.contest, participant), first_tasks)
+
+        # Correct attempt opens next task for this participant only
+        models.Attempt(
+            contest=self.contest, task=self.tasks[3], participant=participant, author=participant.user, answer='flag10'
+        ).submit()
+        self.assertEqual(get_opened_tasks_ids(self._get_contest(), participant), first_tasks | {self.tasks[4].id})
+        with self.assertNumQueries(0):
+            self.assertEqual(get_opened_tasks_ids(self.contest, other_participant), first_tasks)
+
+        opened_task = models.ManualOpenedTask.objects.create(contest=self.contest, task=self.tasks[5], participant=participant)
+        self.assertIn(self.tasks[5].id, get_opened_tasks_ids(self._get_contest(), participant))
+        opened_task.delete()
+        self.assertNotIn(self.tasks[5].id, get_opened_tasks_ids(self._get_contest(), participant))
+
+
+# Cached data is invalidated after the commit, so each change must be really committed
+class ContestSolvedTaskTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.contest = create_contest()
+        self.tasks = [create_task(self.contest, 'flag%d' % i) for i in range(3)]
+        models.ByCategoriesTasksOpeningPolicy.objects.create(contest=self.contest, opens_for_all_participants=True)
+        self.participants = [create_participant(self.contest, 'user%d' % i) for i in range(2)]
+
+    def _submit(self, participant, task, answer):
+        models.Attempt(contest=self.contest, task=task, participant=participant, author=participant.user, answer=answer).submit()
+
+    def _get_solved_tasks(self):
+        return set(models.ContestSolvedTask.objects.filter(contest=self.contest).values_list('task_id', flat=True))
+
+    def test_task_solved_by_anyone_opens_next_task_for_all(self):
+        self._submit(self.participants[0], self.tasks[0], 'flag0')
+        self._submit(self.participants[1], self.tasks[0], 'flag0')
+        self.assertEqual(self._get_solved_tasks(), {self.tasks[0].id})
+        self.assertEqual(get_opened_tasks_ids(self.contest, self.participants[1]), {self.tasks[0].id, self.tasks[1].id})
+
+        # Solution of one participant is rejected, but the task is still solved by another one
+        checker = self.tasks[0].checker
+        checker.answer = 'new flag0'
+        checker.save()
+        models.Attempt.rejudge(models.Attempt.objects.filter(participant=self.participants[0]))
+        self.assertEqual(self._get_solved_tasks(), {self.tasks[0].id})
+
+        models.Attempt.rejudge(models.Attempt.objects.all())
+        self.assertEqual(self._get_solved_tasks(), set())
+        self.assertEqual(get_opened_tasks_ids(self.contest, self.participants[1]), {self.tasks[0].id})
@@ -41,3 +41,11 @@ class EmailConfirmationAdmin(admin.ModelAdmin):
 
 admin.site.register(models.EmailConfirmation, EmailConfirmationAdmin)
 
+
+class ApiTokenAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'created_at', 'updated_at')
+
+    search_fields = ('user__first_name', 'user__last_name', 'user__username', 'user__email')
+
+admin.site.register(models.ApiToken, ApiTokenAdmin)
+
@@ -1,3 +1,5 @@
+import string
+
 from django.contrib.auth.base_user import AbstractBaseUser
 from django.contrib.sites.shortcuts import get_current_site
 from django.core import validators, urlresolvers
@@ -7,6 +9,7 @@ from django.utils.translation import ugettext_lazy as _
 import django.contrib.auth.models as auth_models
 from django.conf import settings
 
+import drapo.models
 from drapo.common import generate_random_secret_string
 
 
@@ -107,3 +110,33 @@ class EmailConfirmation(models.Model):
             '\n\nDrapo CTF checksystem',
             settings.DRAPO_EMAIL_SENDER)
 
+
+
+def generate_api_token():
+    return generate_random_secret_string(40, string.ascii_letters + string.digits)
+
+
+class ApiToken(drapo.models.ModelWithTimestamps):
+    """ Token for API requests, i.e. for the batch attempts submission. Send it in `Authorization: Token <token>` """
+    user = models.OneToOneField(User, related_name='api_token')
+
+    token = models.CharField(max_length=40, unique=True, default=generate_api_token)
+
+    def __str__(self):
+        return 'API token of %s' % (self.user, )
+
+    def regenerate(self):
+        self.token = generate_api_token()
+        self.save()
+
+    @classmethod
+    def get_user_by_request(cls, request):
+        """ Returns user by token from the Authorization header or None """
+        authorization = request.META.get('HTTP_AUTHORIZATION', '').split()
+        if len(authorization) != 2 or authorization[0] != 'Token':
+            return None
+
+        api_token = cls.objects.filter(token=authorization[1]).select_related('user').first()
+        if api_token is None or not api_token.user.is_active:
+            return None
+        return api_token.user
@@ -9,5 +9,6 @@ urlpatterns = [
     url(r'^logout/$', views.logout, name='logout'),
     url(r'^register/$', views.register, name='register'),
     url(r'^edit/$', views.edit, name='edit'),
+    url(r'^api_token/$', views.regenerate_api_token, name='regenerate_api_token'),
     url(r'^change_password/$', views.change_password, name='change_password'),
 ]
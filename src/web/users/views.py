@@ -14,10 +14,15 @@ def profile(request, user_id):
     user_teams = list(user.teams.all())
     is_current_user = user.id == request.user.id
 
+    api_token = None
+    if is_current_user:
+        api_token = models.ApiToken.objects.filter(user=user).first()
+
     return render(request, 'users/profile.html', {
         'profile_user': user,
         'user_teams': user_teams,
-        'is_current_user': is_current_user
+        'is_current_user': is_current_user,
+        'api_token': api_token,
     })
 
 
@@ -90,6 +95,16 @@ def register(request):
     })
 
 
+@login_required
+@require_POST
+def regenerate_api_token(request):
+    api_token, created = models.ApiToken.objects.get_or_create(user=request.user)
+    if not created:
+        api_token.regenerate()
+    messages.success(request, 'New API token is generated')
+    return redirect(request.user)
+
+
 @require_POST
 def logout(request):
     if request.user.is_authenticated():